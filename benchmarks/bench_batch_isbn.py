@@ -0,0 +1,58 @@
+"""
+Compares oldump.batch_isbn.validate_isbns with the per-string isbnlib path it replaces
+Usage:
+    python benchmarks/bench_batch_isbn.py [--count=100000]
+"""
+import argparse
+import random
+import time
+
+import isbnlib
+
+from oldump.batch_isbn import validate_isbns
+from isbnbot.normalize_isbns import NormalizeISBNJob
+
+
+def make_isbns(count: int, seed: int = 0) -> list:
+    """Returns count ISBN strings mixed roughly like the dumps: mostly plain digits, some hyphenated or invalid"""
+    rng = random.Random(seed)
+    isbns = list()
+    for _ in range(count):
+        digits = ''.join(rng.choice('0123456789') for _ in range(9))
+        isbn = digits + isbnlib.check_digit10(digits)
+        if rng.random() < 0.5:
+            isbn = isbnlib.to_isbn13(isbn)
+        kind = rng.random()
+        if kind < 0.1:
+            isbn = '-'.join([isbn[:-7], isbn[-7:-4], isbn[-4:-1], isbn[-1]])
+        elif kind < 0.15:
+            isbn = isbn[:-1] + str((int(isbn[-1]) + 1) % 10) if isbn[-1] != 'X' else isbn[:-1]
+        isbns.append(isbn)
+    return isbns
+
+
+def per_string(isbns: list) -> None:
+    for isbn in isbns:
+        NormalizeISBNJob.isbn_needs_normalization(isbn)
+        canonical = isbnlib.get_canonical_isbn(isbn)
+        if canonical and len(canonical) == 10:
+            isbnlib.to_isbn13(canonical)
+
+
+def timed(fn, isbns: list) -> float:
+    start = time.perf_counter()
+    fn(isbns)
+    return time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--count', type=int, default=100000, help='Number of ISBN strings to validate')
+    _args = parser.parse_args()
+
+    _isbns = make_isbns(_args.count)
+    scalar = timed(per_string, _isbns)
+    batch = timed(validate_isbns, _isbns)
+    print('per-string: %8.0f ISBNs/s' % (len(_isbns) / scalar))
+    print('batch:      %8.0f ISBNs/s' % (len(_isbns) / batch))
+    print('speedup:    %8.1fx' % (scalar / batch))
@@ -0,0 +1,40 @@
+"""
+Compares the oldump.decompress backends on a synthetic gzip dump, reading the lines alone and parsing them too
+Usage:
+    python benchmarks/bench_decompress.py [--rows=500000]
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+from bench_dump_reader import write_dump
+from oldump.decompress import open_gzip_stream
+from oldump.reader import read_dump
+
+
+def read_lines(path: str, backend: str) -> int:
+    with open_gzip_stream(path, backend) as fin:
+        return sum(1 for _ in fin)
+
+
+def parse_rows(path: str, backend: str) -> int:
+    return sum(1 for row in read_dump(path, type_prefix='/type/edition', decompress=backend) if row.json)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=500000, help='Number of rows in the synthetic dump')
+    _args = parser.parse_args()
+
+    backends = ['gzip', 'thread', 'process'] + (['pigz'] if shutil.which('pigz') else [])
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'dump.txt.gz')
+        write_dump(path, _args.rows)
+        for name, fn in (('lines', read_lines), ('parsed', parse_rows)):
+            for backend in backends:
+                start = time.perf_counter()
+                fn(path, backend)
+                seconds = time.perf_counter() - start
+                print('%-7s %-8s %8.2fs %12.0f rows/sec' % (name, backend, seconds, _args.rows / seconds))
@@ -0,0 +1,71 @@
+"""
+Measures rows/sec of oldump.reader.read_dump against the split + json.loads loop the bots used before
+Usage:
+    python benchmarks/bench_dump_reader.py [--rows=200000]
+"""
+import argparse
+import gzip
+import json
+import os
+import random
+import tempfile
+import time
+
+from oldump.reader import orjson, read_dump
+
+
+def write_dump(path: str, rows: int, seed: int = 0) -> None:
+    """Writes a gzip dump of rows editions and works shaped roughly like the real ones"""
+    rng = random.Random(seed)
+    with gzip.open(path, 'wb') as fout:
+        for i in range(rows):
+            if rng.random() < 0.3:
+                _type, key = '/type/work', '/works/OL%dW' % i
+                _json = {'key': key, 'title': 'Work %d' % i, 'authors': [{'author': {'key': '/authors/OL1A'}}]}
+            else:
+                _type, key = '/type/edition', '/books/OL%dM' % i
+                _json = {'key': key, 'title': 'Edition %d' % i, 'works': [{'key': '/works/OL%dW' % i}],
+                         'isbn_13': ['978%010d' % rng.randrange(10 ** 10)], 'publishers': ['Publisher'],
+                         'number_of_pages': rng.randrange(500), 'source_records': ['ia:edition%d' % i]}
+            _json.update(type={'key': _type}, revision=1)
+            fout.write(('\t'.join([_type, key, '1', '2020-01-01T00:00:00', json.dumps(_json)]) + '\n').encode())
+
+
+def split_and_loads(path: str) -> int:
+    count = 0
+    with gzip.open(path, 'rt') as fin:
+        for line in fin:
+            _json = json.loads(line.split('\t')[4])
+            count += _json['type']['key'] == '/type/edition'
+    return count
+
+
+def reader(path: str, decode: bool, backend: str = None) -> int:
+    count = 0
+    for row in read_dump(path, type_prefix='/type/edition', json_backend=backend):
+        if decode:
+            row.json
+        count += 1
+    return count
+
+
+def timed(name: str, rows: int, fn, *args) -> None:
+    start = time.perf_counter()
+    fn(*args)
+    seconds = time.perf_counter() - start
+    print('%-40s %8.2fs %12.0f rows/sec' % (name, seconds, rows / seconds))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=200000, help='Number of rows in the synthetic dump')
+    _args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'dump.txt.gz')
+        write_dump(path, _args.rows)
+        timed('split + json.loads, every row', _args.rows, split_and_loads, path)
+        timed('read_dump, editions, json', _args.rows, reader, path, True, 'json')
+        if orjson is not None:
+            timed('read_dump, editions, orjson', _args.rows, reader, path, True, 'orjson')
+        timed('read_dump, editions, no JSON decode', _args.rows, reader, path, False)
@@ -0,0 +1,45 @@
+"""
+Times batch lookups in an oldump.isbn_index index of synthetic ISBNs
+Usage:
+    python benchmarks/bench_isbn_index.py [--isbns=1000000] [--batch=10000]
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+import isbnlib
+
+from oldump.isbn_index import ISBNIndex, build_isbn_index
+
+
+def make_isbn13(rng) -> str:
+    digits = '978' + ''.join(rng.choice('0123456789') for _ in range(9))
+    return digits + isbnlib.check_digit13(digits)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--isbns', type=int, default=1000000, help='Number of ISBNs in the index')
+    parser.add_argument('--batch', type=int, default=10000, help='Number of ISBNs looked up at once')
+    _args = parser.parse_args()
+
+    rng = random.Random(0)
+    isbns = [make_isbn13(rng) for _ in range(_args.isbns)]
+    with tempfile.TemporaryDirectory() as tmp:
+        tsv_path, index_path = os.path.join(tmp, 'isbns.tsv'), os.path.join(tmp, 'isbns.idx')
+        with open(tsv_path, 'w') as fout:
+            for i, isbn in enumerate(isbns):
+                fout.write('%s\tOL%dM\tOL%dW\n' % (isbn, i + 1, i // 2 + 1))
+        start = time.perf_counter()
+        build_isbn_index(tsv_path, index_path)
+        print('build:          %8.2fs, %d bytes' % (time.perf_counter() - start, os.path.getsize(index_path)))
+
+        queries = rng.sample(isbns, min(_args.batch, len(isbns)))
+        with ISBNIndex(index_path) as index:
+            for name, batch in (('strings', queries), ('ints', [int(isbn) for isbn in queries])):
+                start = time.perf_counter()
+                assert index.lookup(batch).found.all()
+                seconds = time.perf_counter() - start
+                print('%-8s lookup: %8.2fus per ISBN' % (name, seconds / len(batch) * 1e6))
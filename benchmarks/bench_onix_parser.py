@@ -0,0 +1,64 @@
+"""
+Times parsing every product of synthetic ONIX feeds of growing size with onix-bot's OnixFeedParser
+The time per product stays flat as the feed grows when each product's fields are read relative to it; with
+--stream, so does the peak RSS of the process parsing the feed.
+Usage:
+    PYTHONPATH=onix-bot python benchmarks/bench_onix_parser.py [--products=100000] [--stream]
+"""
+import argparse
+import os
+import resource
+import tempfile
+import time
+from multiprocessing import Pool
+
+from onixparser import OnixFeedParser
+
+PRODUCT = """<Product>
+<RecordReference>%(i)d</RecordReference>
+<ProductIdentifier><ProductIDType>02</ProductIDType><IDValue>%(isbn10)s</IDValue></ProductIdentifier>
+<ProductIdentifier><ProductIDType>15</ProductIDType><IDValue>978%(isbn10)s</IDValue></ProductIdentifier>
+<Title><TitleType>01</TitleType><TitleText>Title %(i)d</TitleText></Title>
+<Author><ContributorRole>A01</ContributorRole><PersonName>Author %(i)d</PersonName></Author>
+<Language><LanguageRole>01</LanguageRole><LanguageCode>eng</LanguageCode></Language>
+<Publisher><PublishingRole>01</PublishingRole><PublisherName>Publisher %(i)d</PublisherName></Publisher>
+<CityOfPublication>Oxford</CityOfPublication>
+<CountryOfPublication>GB</CountryOfPublication>
+<MediaFile><MediaFileTypeCode>04</MediaFileTypeCode><MediaFileLinkTypeCode>01</MediaFileLinkTypeCode>
+<MediaFileLink>http://example.com/%(i)d.jpg</MediaFileLink></MediaFile>
+</Product>
+"""
+
+
+def write_feed(path: str, products: int) -> None:
+    with open(path, 'w') as fout:
+        fout.write('<?xml version="1.0"?>\n<ONIXMessage>\n<Header><FromCompany>Example</FromCompany></Header>\n')
+        for i in range(products):
+            fout.write(PRODUCT % {'i': i, 'isbn10': '%010d' % i})
+        fout.write('</ONIXMessage>\n')
+
+
+def parse_feed(path: str, stream: bool):
+    """Returns the seconds taken to read every product of the feed at path, and the peak RSS in KiB"""
+    start = time.perf_counter()
+    for i, product in enumerate(OnixFeedParser(path, stream=stream).products):
+        product.get_json
+        assert product.title == 'Title %d' % i
+    return time.perf_counter() - start, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--products', type=int, default=100000, help='Number of products in the largest feed')
+    parser.add_argument('--stream', action='store_true', help='Stream the products instead of loading the feed')
+    _args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'feed.xml')
+        for products in sorted({max(1, _args.products // n) for n in (8, 4, 2, 1)}):
+            write_feed(path, products)
+            # a fresh process per feed, so its peak RSS is that feed's alone
+            with Pool(1) as pool:
+                seconds, max_rss = pool.apply(parse_feed, (path, _args.stream))
+            print('%8d products: %8.2fs, %6.1fus per product, %7.1f MiB peak RSS' % (
+                products, seconds, seconds / products * 1e6, max_rss / 1024))
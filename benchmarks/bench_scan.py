@@ -0,0 +1,40 @@
+"""
+Measures how oldump.scan.scan_chunks scales with worker processes on a synthetic uncompressed dump
+Usage:
+    python benchmarks/bench_scan.py [--rows=1000000] [--max-workers=<cores>]
+"""
+import argparse
+import gzip
+import os
+import shutil
+import tempfile
+import time
+
+from bench_dump_reader import write_dump
+from oldump.scan import iter_rows, scan_chunks
+
+
+def count_isbns(chunk: bytes) -> int:
+    return sum(len(row.json.get('isbn_13', [])) for row in iter_rows(chunk, type_prefix='/type/edition'))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1000000, help='Number of rows in the synthetic dump')
+    parser.add_argument('--max-workers', type=int, default=os.cpu_count(), help='Largest pool to time')
+    _args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'dump.txt')
+        write_dump(path + '.gz', _args.rows)
+        with gzip.open(path + '.gz', 'rb') as fin, open(path, 'wb') as fout:
+            shutil.copyfileobj(fin, fout)
+        workers, baseline = 1, None
+        while workers <= _args.max_workers:
+            start = time.perf_counter()
+            sum(scan_chunks(path, count_isbns, workers))
+            seconds = time.perf_counter() - start
+            baseline = baseline or seconds
+            print('%3d workers %8.2fs %12.0f rows/sec %6.1fx' % (workers, seconds, _args.rows / seconds,
+                                                                 baseline / seconds))
+            workers *= 2
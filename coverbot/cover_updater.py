@@ -1,30 +1,163 @@
 """
 Adds a cover to a coverless edition if it has an ocaid
-NOTE: This script assumes the Open Library Dump passed only contains coverless editions with an ocaid
+Streams a complete Open Library dump (or one already filtered by find_coverless_editions_in_library.sh) and picks
+the coverless editions with an ocaid by their raw bytes, so nothing else is decoded.
 """
 
-import gzip
-import json
-import sys
+import argparse
+import logging
+import time
 
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from itertools import islice
 from olclient.openlibrary import OpenLibrary
+from coverbot.preflight import CoverPreflight
+from oldump.cache import EditionCache
+from oldump.journal import Journal
+from oldump.ratelimit import RateLimiter
+from oldump.reader import read_dump
+from oldump.revisions import edition_from_json, unchanged_keys
+
+REVISION_CHECK_SIZE = 100  # editions whose live revisions are queried at once
+PROGRESS_INTERVAL = 60  # seconds between progress reports
+COVER_URL = 'https://archive.org/download/%s/page/cover'
+HAS_OCAID = b'"ocaid":'
+HAS_COVERS = b'"covers":'
+
+logger = logging.getLogger('coverbot')
+
+
+def str2bool(value):
+    if isinstance(value, bool):
+        return value
+    if value.lower() in ('yes', 'true', 't', 'y', '1'):
+        return True
+    elif value.lower() in ('no', 'false', 'f', 'n', '0'):
+        return False
+    else:
+        raise argparse.ArgumentTypeError('Boolean value expected.')
+
+
+def dump_editions(path):
+    """Yields (key, revision, ocaid, JSON) of the editions in a dump with an ocaid and no covers"""
+    for row in read_dump(path, type_prefix='/type/edition'):
+        if HAS_OCAID in row.line and HAS_COVERS not in row.line and row.json.get('ocaid'):
+            yield row.key, row.revision, row.json['ocaid'], row.json
+
+
+def cached_editions(path):
+    """Yields (key, revision, ocaid, None) of the coverless editions with an ocaid in an oldump.cache database"""
+    with EditionCache(path) as cache:
+        for key, revision, ocaid in cache.coverless_with_ocaid():
+            yield key, revision, ocaid, None
+
+
+class CoverUpdater(object):
+    """
+    Adds covers to editions from a pool of worker threads
+    Every request of every worker waits its turn under one rate limit of rate requests per second.
+    """
+
+    def __init__(self, ol, workers: int = 1, rate: float = None, check_revisions: bool = False):
+        self.ol = ol
+        self.workers = workers
+        self.limiter = RateLimiter(rate)
+        self.check_revisions = check_revisions
+        self.fixed = 0
+        self.skipped = 0  # editions that had a cover by the time they were fetched
+        self.failed = 0
+        self.started = None
+        self.last_progress = None
+
+    def run(self, editions, on_fixed) -> None:
+        """
+        Adds a cover to each of editions ((key, revision, ocaid, JSON or None) tuples)
+        on_fixed -- called with the OLID of each edition, from this thread, once its cover upload succeeded
+        """
+        self.started = self.last_progress = time.monotonic()
+        with ThreadPoolExecutor(self.workers) as executor:
+            pending = set()
+            for batch in iter(lambda: list(islice(editions, REVISION_CHECK_SIZE)), []):
+                unchanged = set()
+                if self.check_revisions:
+                    # only editions read from a dump can be rebuilt from their JSON
+                    self.limiter.wait()
+                    unchanged = unchanged_keys(self.ol, {key: revision for key, revision, _, _json in batch if _json})
+                for key, revision, ocaid, _json in batch:
+                    if len(pending) >= 2 * self.workers:
+                        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        self._finish(done, on_fixed)
+                    pending.add(executor.submit(self.add_cover, key, ocaid, _json if key in unchanged else None))
+            self._finish(wait(pending).done, on_fixed)
+        self.log_progress()
+
+    def add_cover(self, key: str, ocaid: str, _json: dict = None):
+        """Returns the OLID of the edition at key once a cover was added to it, or None if it already had one"""
+        if _json is not None:
+            edition = edition_from_json(self.ol, _json)
+        else:
+            self.limiter.wait()
+            edition = self.ol.Edition.get(key.split('/')[-1])
+        if len(getattr(edition, 'covers', [])):
+            return None
+        self.limiter.wait()
+        edition.add_bookcover(COVER_URL % ocaid).raise_for_status()
+        return edition.olid
+
+    def _finish(self, futures, on_fixed) -> None:
+        for future in futures:
+            try:
+                olid = future.result()
+            except Exception as e:
+                self.failed += 1
+                logger.warning('Adding a cover failed: %s' % e)
+                continue
+            if olid is None:
+                self.skipped += 1
+            else:
+                self.fixed += 1
+                on_fixed(olid)
+        if time.monotonic() - self.last_progress >= PROGRESS_INTERVAL:
+            self.log_progress()
+
+    def log_progress(self) -> None:
+        self.last_progress = time.monotonic()
+        done = self.fixed + self.skipped + self.failed
+        seconds = self.last_progress - self.started
+        logger.info('%d editions in %.0fs (%.1f editions/sec): %d covers added, %d already had one, %d failed' % (
+            done, seconds, done / seconds if seconds else 0, self.fixed, self.skipped, self.failed))
+
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('ol_dump', help='Path to an Open Library dump, *.txt(.gz), or to an oldump.cache database '
+                                        'with --cache')
+    parser.add_argument('journal_path', help='Path to *.txt the OLIDs of fixed editions are appended to; editions '
+                                             'already listed there are skipped, so a rerun resumes')
+    parser.add_argument('--cache', type=str2bool, default=False,
+                        help='ol_dump is an oldump.cache database built from a complete dump')
+    parser.add_argument('--check-revisions', type=str2bool, default=False,
+                        help='Only fetch editions whose revision changed since the dump')
+    parser.add_argument('--workers', type=int, default=1, help='Editions updated at once')
+    parser.add_argument('--rate', type=float, default=None,
+                        help='Most requests per second to Open Library, across all workers (default: no limit)')
+    parser.add_argument('--preflight', type=str2bool, default=False,
+                        help='Check that each cover URL resolves to an image before adding it')
+    parser.add_argument('--preflight-concurrency', type=int, default=20, help='Cover URLs checked at once')
+    _args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(message)s')
     ol = OpenLibrary()
-    filtered_ol_dump = sys.argv[1]
-    output_filepath = sys.argv[2]
-    with gzip.open(filtered_ol_dump, 'rb') as fin:
-        header = {'type': 0,
-                  'key': 1,
-                  'revision': 2,
-                  'last_modified': 3,
-                  'JSON': 4}
-        with gzip.open(output_filepath, 'a') as fout:
-            for row in fin:
-                row = row.decode().split('\t')
-                _json = json.loads(row[header['JSON']])
-                olid = _json['key'].split('/')[-1]
-                edition_obj = ol.Edition.get(olid)
-                if not len(getattr(edition_obj, 'covers', [])):
-                    fout.write(edition_obj.olid + '\n')
-                    edition_obj.add_bookcover('https://archive.org/download/%s/page/cover' % _json['ocaid'])
+    editions = (cached_editions if _args.cache else dump_editions)(_args.ol_dump)
+    preflight = CoverPreflight(COVER_URL, _args.preflight_concurrency) if _args.preflight else None
+    updater = CoverUpdater(ol, _args.workers, _args.rate, _args.check_revisions)
+    with Journal(_args.journal_path) as journal:
+        if len(journal):
+            logger.info('Skipping the %d editions already in %s' % (len(journal), _args.journal_path))
+        editions = (edition for edition in editions if edition[0] not in journal)
+        if preflight is not None:
+            editions = preflight.filter(editions)
+        updater.run(editions, journal.add)
+    if preflight is not None:
+        logger.info('Pre-flight: %d covers found, %d missing, %d checks failed' % (
+            preflight.passed, preflight.rejected, preflight.errors))
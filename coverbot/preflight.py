@@ -0,0 +1,125 @@
+"""
+Pre-flight check that an edition's cover image exists before Open Library is asked to fetch it
+A background thread reads editions ahead of whatever consumes them and starts a HEAD request for each cover (a one
+byte range GET where HEAD is refused) on a pool of threads sharing a pooled requests session, so checks overlap
+with the cover uploads downstream. Outcomes are cached by ocaid, for the most recently seen ocaids, and only
+editions whose cover URL resolves to an image are passed on, in order. Editions whose check failed are counted
+apart from those whose cover is missing.
+"""
+import logging
+import queue
+import threading
+
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import requests
+
+from requests.adapters import HTTPAdapter
+
+PREFLIGHT_LOOKAHEAD = 200  # editions read, and their covers checked, ahead of the consumer
+PREFLIGHT_CACHE_SIZE = 100000  # ocaids whose outcome is kept, the least recently used dropped first
+
+logger = logging.getLogger('coverbot.preflight')
+
+
+class CoverPreflight(object):
+
+    def __init__(self, url_template: str, concurrency: int = 20, timeout: float = 10, session=None,
+                 cache_size: int = PREFLIGHT_CACHE_SIZE):
+        """url_template -- cover URL with a %s for the ocaid"""
+        self.url_template = url_template
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.cache_size = cache_size
+        self.session = session or requests.Session()
+        adapter = HTTPAdapter(pool_connections=concurrency, pool_maxsize=concurrency)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.cache = OrderedDict()  # {ocaid: whether its cover is an image, or the future of a check in flight}
+        self.lock = threading.Lock()
+        self.passed = 0
+        self.rejected = 0
+        self.errors = 0
+
+    def is_image(self, ocaid: str) -> bool:
+        """Returns whether the cover URL of ocaid resolves to an image, following redirects"""
+        url = self.url_template % ocaid
+        response = self.session.head(url, allow_redirects=True, timeout=self.timeout)
+        if response.status_code in (405, 501):
+            response = self.session.get(url, headers={'Range': 'bytes=0-0'}, stream=True, timeout=self.timeout)
+            response.close()
+        return response.status_code in (200, 206) and response.headers.get('Content-Type', '').startswith('image/')
+
+    def check(self, executor, ocaid: str) -> Future:
+        """Returns a future of the _check() of ocaid, starting it on executor unless cached"""
+        with self.lock:
+            cached = self.cache.get(ocaid)
+            if cached is None:
+                cached = self.cache[ocaid] = executor.submit(self._check, ocaid)
+                if len(self.cache) > self.cache_size:
+                    self.cache.popitem(last=False)
+            else:
+                self.cache.move_to_end(ocaid)
+        if isinstance(cached, Future):
+            return cached
+        future = Future()
+        future.set_result(cached)
+        return future
+
+    def _check(self, ocaid: str):
+        """Returns whether the cover of ocaid is an image, or None if the check failed"""
+        try:
+            is_image = self.is_image(ocaid)
+        except requests.RequestException as e:
+            logger.warning('Cover check for %s failed: %s' % (ocaid, e))
+            is_image = None
+        with self.lock:
+            if is_image is None:
+                self.cache.pop(ocaid, None)  # not cached, so a later edition asks again
+            elif ocaid in self.cache:
+                self.cache[ocaid] = is_image  # only the outcome is kept, not the finished future
+        return is_image
+
+    def filter(self, editions, lookahead: int = PREFLIGHT_LOOKAHEAD):
+        """Yields the editions ((key, revision, ocaid, JSON) tuples) whose cover is an image, in order"""
+        checks = queue.Queue(lookahead)  # (edition, future), then (None, the exception that stopped reading or None)
+        stop = threading.Event()
+
+        def read_ahead():
+            error = None
+            try:
+                for edition in editions:
+                    if stop.is_set():
+                        return
+                    checks.put((edition, self.check(executor, edition[2])))
+            except Exception as e:
+                error = e
+            checks.put((None, error))
+
+        executor = ThreadPoolExecutor(self.concurrency)
+        reader = threading.Thread(target=read_ahead, daemon=True)
+        reader.start()
+        try:
+            while True:
+                edition, result = checks.get()
+                if edition is None:
+                    if result is not None:
+                        raise result
+                    return
+                is_image = result.result()
+                if is_image:
+                    self.passed += 1
+                    yield edition
+                elif is_image is None:
+                    self.errors += 1
+                else:
+                    self.rejected += 1
+        finally:
+            stop.set()
+            while reader.is_alive():  # unblock the reader if the queue is full
+                try:
+                    checks.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+            executor.shutdown()
@@ -1,8 +1,13 @@
 #!/usr/bin/python
 
-import isbnlib
-import json
+import argparse
 import sys
+from itertools import islice
+
+from oldump.batch_isbn import validate_isbns
+from oldump.isbn_records import RecordWriter, parse_tsv, sort_records
+from oldump.runs import merge_runs
+from oldump.scan import iter_rows, scan_dump
 
 # Extracts ISBN_13 OLID W-WOLID from openlibrary edition data dumps.
 #
@@ -14,13 +19,20 @@ import sys
 # if the isbn does not validate.
 #
 
-infile = "/storage/openlibrary/ol_dump_editions_2018-06-30.txt"
-infile = sys.argv[1] 
+CHUNK_SIZE = 10000  # editions whose ISBNs are validated in one batch
+ISBN13_PREFIXES = ('978', '979')
+
+
+def extract(rows):
+    """Returns the output lines for a list of edition rows"""
+    lines = []
+    books = [row.json for row in rows]
+    isbns = [book.get('isbn_13', []) + book.get('isbn_10', []) for book in books]
+    # every ISBN is canonicalized once, in a single batch for the chunk
+    result = validate_isbns([isbn for book_isbns in isbns for isbn in book_isbns])
 
-with open(infile) as f:
-    for line in f:
-        data = line.split("\t")
-        book = json.loads(data[4])
+    position = 0
+    for book, book_isbns in zip(books, isbns):
         olid = book.get('key').replace('/books/', '')
         wolid = book.get('works', 'NONE')
         if wolid != 'NONE':
@@ -29,25 +41,62 @@ with open(infile) as f:
         # get isbn
         good_isbn = []
         bad_isbn = []
-        isbn_13 = book.get('isbn_13', [])
-        isbn_10 = book.get('isbn_10', [])
-        for isbn in isbn_13 + isbn_10:
-            canonical = isbnlib.get_canonical_isbn(isbn)
-            if canonical: 
-                if len(canonical) == 10:
-                    canonical = isbnlib.to_isbn13(canonical)
-                good_isbn.append(canonical)
+        for isbn, isbn13 in zip(book_isbns, result.isbn13[position:position + len(book_isbns)]):
+            if isbn13:
+                good_isbn.append(isbn13)
             else:
                 bad_isbn.append(isbn)
+        position += len(book_isbns)
 
-        isbns = set(good_isbn)
-        for isbn in isbns:
-            try:
-                assert isbnlib.get_canonical_isbn(isbn)
-                print("\t".join([isbnlib.get_canonical_isbn(isbn), olid, wolid]))
-            except Exception as e:
+        for isbn in set(good_isbn):
+            # isbnlib also accepts hyphenated 13 digit strings without a Bookland prefix, which are not ISBN-13s
+            if isbn.startswith(ISBN13_PREFIXES):
+                lines.append("\t".join([isbn, olid, wolid]) + "\n")
+            else:
                 bad_isbn.append(isbn)
 
         for bad in bad_isbn:
-            print(u"\t".join([u'BAD-ISBN:', repr(bad), olid, wolid]))
+            lines.append(u"\t".join([u'BAD-ISBN:', repr(bad), olid, wolid]) + "\n")
+    return lines
+
+
+def extract_chunk(chunk):
+    """Returns the output lines for a chunk of a dump, as handed out by oldump.scan.scan_dump"""
+    rows = iter_rows(chunk)
+    return [line for batch in iter(lambda: list(islice(rows, CHUNK_SIZE)), []) for line in extract(batch)]
+
+
+def extract_chunk_sorted(chunk):
+    return sorted(set(extract_chunk(chunk)))
+
+
+def extract_chunk_records(chunk):
+    """Returns (oldump.isbn_records records, BAD-ISBN lines) for a chunk of a dump"""
+    return parse_tsv(extract_chunk(chunk))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('infile', help='e.g. /storage/openlibrary/ol_dump_editions_2018-06-30.txt(.gz)')
+    parser.add_argument('--workers', type=int, default=None, help='Processes scanning the dump (default: one per core)')
+    parser.add_argument('--sorted', action='store_true',
+                        help='Write the output sorted, without repeated lines, like `sort -u`; ISBN lines sort by '
+                             'ISBN and come before the BAD-ISBN lines')
+    parser.add_argument('--binary', metavar='PATH',
+                        help='Write fixed width oldump.isbn_records to PATH instead of TSV to stdout')
+    parser.add_argument('--bad-isbns', metavar='PATH',
+                        help='With --binary, where the BAD-ISBN lines are written (default: <binary PATH>.bad.tsv)')
+    args = parser.parse_args()
 
+    if args.binary:
+        with RecordWriter(args.binary) as writer, open(args.bad_isbns or args.binary + '.bad.tsv', 'w') as bad_file:
+            for records, bad in scan_dump(args.infile, extract_chunk_records, args.workers):
+                writer.write(records)
+                bad_file.writelines(bad)
+        if args.sorted:
+            sort_records(args.binary)
+    elif args.sorted:
+        merge_runs(scan_dump(args.infile, extract_chunk_sorted, args.workers), sys.stdout)
+    else:
+        for lines in scan_dump(args.infile, extract_chunk, args.workers):
+            sys.stdout.writelines(lines)
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Some Archive.org items have old-style `openlibrary` IDs, and no `openlibrary-edition`.
+Many of these OL editions don't have `ocaid`
+   https://github.com/internetarchive/openlibrary/issues/1046
+This script collects data from archive.org and openlibrary.org and creates lists and stats
+for the various categories, reading the editions dump once.
+"""
+import argparse
+import datetime
+import os
+import re
+import subprocess
+import sys
+
+from collections import namedtuple
+
+from oldump.olid import pack_olid, unpack_olid
+from oldump.reader import read_dump
+
+EDITION_OLID = re.compile(r'OL[0-9]+M')
+HAS_WORKS = b'"works":'
+HAS_OCAID = b'"ocaid"'
+
+# linked: count of dump editions referenced by the results; orphans and no_ocaid: packed OLIDs of those without
+# works and without an ocaid
+LegacyEditions = namedtuple('LegacyEditions', ['linked', 'orphans', 'no_ocaid'])
+
+
+def legacy_olids(results_path):
+    """Returns the packed OLIDs of the editions referenced by the archive.org search results"""
+    with open(results_path) as fin:
+        return {pack_olid(olid) for line in fin for olid in EDITION_OLID.findall(line)}
+
+
+def join_dump(dump, legacy) -> LegacyEditions:
+    """
+    Joins the editions of a dump with legacy (packed OLIDs) in one pass and sorts them into the report categories
+    Editions are matched on their exact key, where the shell version's grep -Ff matched the OLIDs anywhere in a
+    row, so rows that merely mention a legacy OLID are no longer counted.
+    """
+    linked = 0
+    orphans = set()
+    no_ocaid = set()
+    for row in read_dump(dump, type_prefix='/type/edition'):
+        try:
+            olid = pack_olid(row.key)
+        except ValueError:
+            continue
+        if olid not in legacy:
+            continue
+        linked += 1
+        if HAS_WORKS not in row.line:
+            orphans.add(olid)
+        if HAS_OCAID not in row.line:
+            no_ocaid.add(olid)
+    return LegacyEditions(linked, orphans, no_ocaid)
+
+
+def write_olids_to_update(results_path, no_ocaid, path):
+    """Writes the lines of the search results that reference an edition of no_ocaid, the input of update-ocaid.py"""
+    with open(results_path) as fin, open(path, 'w') as fout:
+        fout.writelines(line for line in fin if any(pack_olid(olid) in no_ocaid for olid in EDITION_OLID.findall(line)))
+
+
+def write_list(path, olids):
+    with open(path, 'w') as fout:
+        fout.writelines(olid + '\n' for olid in sorted(unpack_olid(olid) for olid in olids))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--dump', default='ol_dump_editions_latest.txt',
+                        help='Open Library editions dump, *.txt or *.txt.gz')
+    parser.add_argument('--results', help='Saved output of `ia search "openlibrary:* AND NOT openlibrary_edition:*" '
+                                          '-f"openlibrary"` (default: run the search)')
+    args = parser.parse_args()
+
+    # Test for Open Library edition dump file:
+    if not os.path.isfile(args.dump):
+        print("")
+        print("Open Library Editions dump file '%s' not found!" % args.dump)
+        print("Please download it to the current directory by running the following command:")
+        print("  wget https://openlibrary.org/data/ol_dump_editions_latest.txt.gz")
+        print("and pass it with --dump=ol_dump_editions_latest.txt.gz")
+        sys.exit(1)
+
+    # Get IA items with only legacy field:
+    results = args.results
+    if results is None:
+        results = "legacy-openlibrary-field_%s.txt" % datetime.date.today().isoformat()
+        print(" Getting list of archive.org items with only a legacy openlibrary field...")
+        with open(results, 'w') as fout:
+            subprocess.run(['ia', 'search', 'openlibrary:* AND NOT openlibrary_edition:*', '-fopenlibrary'],
+                           stdout=fout, check=True)
+
+    # Extract OLIDs
+    legacy = legacy_olids(results)
+
+    print("  Getting data of all uniq editions referenced by archive.org items with only legacy openlibrary field...")
+    linked, orphans, no_ocaid = join_dump(args.dump, legacy)
+
+    # Generate lists of missing-ocaids and orphans:
+    print("lists:")
+    write_list('no-ocaid.lst', no_ocaid)
+    write_list('orphan.lst', orphans)
+
+    # Finally generate the list (olids-to-update.txt) to pass to the next script: update-ocaid.py
+    write_olids_to_update(results, no_ocaid, 'olids-to-update.txt')
+
+    print("Report %s:" % datetime.datetime.now().strftime('%c'))
+    print("Uniq editions referenced by archive.org items with only legacy openlibrary field")
+    print(" Total: %d" % linked)
+    print(" Orphans: %d" % len(orphans))
+    print(" Have OCAID: %d" % (linked - len(no_ocaid)))
+    print(" No OCAID: %d" % len(no_ocaid))
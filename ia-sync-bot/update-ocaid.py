@@ -1,54 +1,188 @@
 #!/usr/bin/env python3
+import argparse
 import json
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from itertools import islice
 from olclient.openlibrary import OpenLibrary
-ol = OpenLibrary()
-
-infile = "olids-to-update.txt"
+from oldump.index import DumpIndex
+from oldump.journal import Journal
+from oldump.ratelimit import RateLimiter
+from oldump.revisions import edition_from_json, unchanged_keys
+from oldump.sync_cache import FAILED, NO_CHANGES, SYNCED, SyncCache
+from requests.adapters import HTTPAdapter
 
 # Takes an infile and writes ocaids to Open Library items and performs a sync.
 
 # infile is the json output of an archive.org search query
 # containing 'openlibrary' (edition olid) and 'identifier' (ocaid) fields
 
+PROGRESS_EVERY = 100  # OLIDs between progress reports
+REVISION_CHECK_SIZE = 100  # input OLIDs whose live revisions are queried at once with --dump
+
+
+def items(f, journal):
+    for line in f:
+        # OLD TSV FORMAT: ocaid, olid = line.split()
+        data = json.loads(line)
+        try:
+            if data.get('openlibrary') in journal:
+                continue
+        except ValueError:
+            print("Skipping %s: not an edition OLID" % line.strip())
+            continue
+        yield data.get('openlibrary'), data.get('identifier')
+
+
+class OcaidUpdater(object):
+    """
+    Each OLID runs get -> save -> sync (-> save -> sync on a 500) in order on one
+    worker, while many OLIDs run at once. OLIDs are journaled once done, so a
+    rerun after a crash or an interruption picks up where it stopped. Sync
+    outcomes are cached by OLID and revision across runs, so an edition that is
+    already in sync is not synced again until it is edited. With a dump index,
+    the live revisions of a window of OLIDs are checked with one query, and
+    editions still at their dump revision are read from the dump; those already
+    synced at that revision make no request at all.
+    """
+
+    def __init__(self, ol, sync_cache, workers: int = 1, rate: float = None, dump_index=None):
+        self.ol = ol
+        self.sync_cache = sync_cache
+        self.workers = workers
+        self.limiter = RateLimiter(rate)
+        self.dump_index = dump_index
+        self.done = 0
+        self.failed = 0
+        self.started = None
+
+    def dump_editions(self, olids):
+        """Returns {olid: JSON} of the editions among olids still at their dump revision, checked with one query"""
+        if self.dump_index is None:
+            return {}
+        rows = {olid: self.dump_index.get(olid) for olid in olids}
+        rows = {olid: row for olid, row in rows.items() if row is not None}
+        if not rows:
+            return {}
+        self.limiter.wait()
+        unchanged = unchanged_keys(self.ol, {row.key: row.revision for row in rows.values()})
+        return {olid: row.json for olid, row in rows.items() if row.key in unchanged}
+
+    def get_edition(self, olid, _json=None):
+        if _json is not None:
+            return edition_from_json(self.ol, _json)
+        self.limiter.wait()
+        return self.ol.get(olid)
+
+    def save(self, edition, comment):
+        """Returns the revision saved, or None if the response does not tell; raises if the save failed"""
+        self.limiter.wait()
+        r = edition.save(comment)
+        r.raise_for_status()
+        try:
+            return r.json().get('revision')
+        except (AttributeError, ValueError):
+            return None
+
+    def sync_ol_to_ia(self, olid, ocaid, revision):
+        self.limiter.wait()
+        r = self.ol.session.get(self.ol.base_url + "/admin/sync?edition_id=" + olid)
+        if r.status_code == 500:
+            content = {'error': 'HTTP 500'}
+        else:
+            content = r.json()
+        if 'error' not in content:
+            outcome = SYNCED
+        elif 'no changes to _meta.xml' in content['error']:
+            outcome = NO_CHANGES
+        else:  # and r.json()['error'] == 'No qualifying edition':
+            outcome = FAILED
+            print("%s, %s: %s" % (olid, ocaid, content))
+        self.sync_cache.record(olid, revision, outcome)
+        return r.status_code
+
+    def update(self, olid, ocaid, _json=None):
+        # check and add ocaid to OL edition
+        print("Adding %s to %s" % (ocaid, olid))
+        edition = self.get_edition(olid, _json)
+        assert edition.title, "Missing title in %s!" % olid
+        revision = getattr(edition, 'revision', None)
+
+        if hasattr(edition, 'ocaid'):
+            print("  OCAID already found: %s" % edition.ocaid)
+            if self.sync_cache.is_done(olid, revision):
+                print("  Already synced at revision %d" % revision)
+                return olid
+        else:
+            edition.ocaid = ocaid
+            revision = self.save(edition, 'add ocaid')
+        # sync the edition
+        r = self.sync_ol_to_ia(olid, ocaid, revision)
+        if r == 500:
+            edition.ocaid = ocaid
+            revision = self.save(edition, 'update ocaid')
+            self.sync_ol_to_ia(olid, ocaid, revision)
+        return olid
+
+    def run(self, f, journal) -> None:
+        """Updates the OLIDs of the input lines of f, skipping and journaling done OLIDs in journal"""
+        self.started = time.monotonic()
+        futures_olids = {}
+        with ThreadPoolExecutor(self.workers) as executor:
+            pending = items(f, journal)
+            for batch in iter(lambda: list(islice(pending, REVISION_CHECK_SIZE)), []):
+                editions = self.dump_editions([olid for olid, _ in batch])
+                for olid, ocaid in batch:
+                    if len(futures_olids) >= 2 * self.workers:
+                        finished, _ = wait(futures_olids, return_when=FIRST_COMPLETED)
+                        self.finish(finished, futures_olids, journal)
+                    futures_olids[executor.submit(self.update, olid, ocaid, editions.get(olid))] = olid
+            self.finish(wait(futures_olids).done, futures_olids, journal)
+
+    def finish(self, futures, futures_olids, journal) -> None:
+        for future in futures:
+            olid = futures_olids.pop(future)
+            try:
+                journal.add(future.result())
+                self.done += 1
+            except Exception as e:
+                self.failed += 1
+                print("%s failed: %s" % (olid, e))
+            if (self.done + self.failed) % PROGRESS_EVERY == 0:
+                seconds = time.monotonic() - self.started
+                print("%d OLIDs done, %d failed in %.0fs (%.1f/sec)" % (
+                    self.done, self.failed, seconds, (self.done + self.failed) / seconds))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('infile', nargs='?', default='olids-to-update.txt')
+    parser.add_argument('--dump', help='Open Library editions dump indexed with `python -m oldump.index`; editions '
+                                       'whose revision is unchanged since the dump are read from it, not fetched')
+    parser.add_argument('--workers', type=int, default=1, help='OLIDs updated at once')
+    parser.add_argument('--rate', type=float, default=None,
+                        help='Most requests per second to Open Library, across all workers (default: no limit)')
+    parser.add_argument('--checkpoint', default=None,
+                        help='Journal of the OLIDs already done (default: <infile>.done); they are skipped on a rerun')
+    parser.add_argument('--sync-cache', default='sync-cache.tsv',
+                        help='Outcomes of earlier syncs by OLID and revision, kept across runs; editions synced (or '
+                             'with nothing to sync) at their current revision are not synced again')
+    args = parser.parse_args()
+
+    ol = OpenLibrary()
+    adapter = HTTPAdapter(pool_connections=args.workers, pool_maxsize=args.workers)
+    ol.session.mount('http://', adapter)
+    ol.session.mount('https://', adapter)
+    dump_index = DumpIndex(args.dump) if args.dump else None
+    with open(args.infile) as f, Journal(args.checkpoint or args.infile + '.done') as journal, \
+            SyncCache(args.sync_cache) as sync_cache:
+        if len(journal):
+            print("Skipping %d OLIDs already done" % len(journal))
+        updater = OcaidUpdater(ol, sync_cache, args.workers, args.rate, dump_index)
+        updater.run(f, journal)
+    print("%d OLIDs done, %d failed in %.0fs" % (updater.done, updater.failed, time.monotonic() - updater.started))
+    print("Sync cache: %d hits, %d misses" % (sync_cache.hits, sync_cache.misses))
 
-def sync_ol_to_ia(olid):
-    r = ol.session.get(ol.base_url + "/admin/sync?edition_id=" + olid)
-    if r.status_code == 500:
-        content = {'error': 'HTTP 500'}
-    else:
-        content = r.json()
-    if 'error' in content and 'no changes to _meta.xml' not in content['error']:  # and r.json()['error'] == 'No qualifying edition':
-        print("%s, %s: %s" % (olid, ocaid, content))
-    return r.status_code
-
-# start and end are False or line numbers in infile to begin and stop processing
-# Used in case there is a need to resume or re-run part of a batch.
-start = False
-end = False
-with open(infile) as f:
-   for count, line in enumerate(f):
-       # OLD TSV FORMAT: ocaid, olid = line.split()
-       data = json.loads(line)
-       ocaid = data.get('identifier')
-       olid  = data.get('openlibrary')
-       if start and count < start:
-           continue
-       if end and count > end:
-           break
-       # check and add ocaid to OL edition
-       print("Adding %s to %s" % (ocaid, olid))
-       edition = ol.get(olid)
-       assert edition.title, "Missing title in %s!" % olid
-
-       if hasattr(edition, 'ocaid'):
-           print("  OCAID already found: %s" % edition.ocaid)
-       else:
-           edition.ocaid = ocaid
-           edition.save('add ocaid') 
-       # sync the edition
-       r = sync_ol_to_ia(olid)
-       if r == 500:
-           edition.ocaid = ocaid
-           edition.save('update ocaid')
-           sync_ol_to_ia(olid)
 
+if __name__ == '__main__':
+    main()
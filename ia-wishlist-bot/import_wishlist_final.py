@@ -10,8 +10,10 @@ Output: 'Adding books to the Open Library'
 # Using the Open Library Client
 from olclient.openlibrary import OpenLibrary
 import olclient.common as common
+from oldump.isbn_index import ISBNIndex
 
 import csv
+import os
 import requests
 import json 
 
@@ -24,8 +26,21 @@ import ast
 # File used in the whole script
 FILE = 'data/wishlist_works_may_2018.csv'
 
+# ISBN index built with `python -m oldump.isbn_index` from the output of
+# ia-sync-bot/extract-isbn.py; when it exists ISBNs are looked up in it
+# instead of on Open Library
+ISBN_INDEX = 'data/isbns.idx'
+
 # Creating an object of the Open Library Client
 ol = OpenLibrary()
+isbn_index = ISBNIndex(ISBN_INDEX) if os.path.exists(ISBN_INDEX) else None
+
+
+def find_edition(isbn, oclc=None):
+    if isbn and isbn_index is not None:
+        return isbn_index.get(isbn)
+    return ol.Edition.get(isbn=isbn, oclc=oclc)
+
 
 # reader = csv.reader(open(FILE, "rt"))
 # Count of books added to Open Library
@@ -41,8 +56,8 @@ with open(FILE, "rt") as infile:
         # print(row[6])
 
         # Calls using the Open Library Client
-        work = ol.Edition.get(isbn=row[5], oclc=row[4])
-        work1 = ol.Edition.get(isbn=row[6])
+        work = find_edition(isbn=row[5], oclc=row[4])
+        work1 = find_edition(isbn=row[6])
         # correct_title = row[0].replace(".", "").replace("'", "").replace(",","").replace("!","")
         # new_title = '"' + correct_title.split(":")[0].replace(" ", "+") + '"'
         correct_title = str.maketrans('', '', string.punctuation)
@@ -0,0 +1,2 @@
+"""Batch ISBN validation, moved to oldump.batch_isbn so the other bots can use it without isbnbot"""
+from oldump.batch_isbn import ALLOWED_ISBN_CHARS, ISBNBatchResult, validate_isbn, validate_isbns  # noqa: F401
@@ -1,24 +1,46 @@
 """
 normalize ISBNs
-NOTE: This script assumes the Open Library Dump passed only contains editions with an isbn_10 or isbn_13
+Reads a complete Open Library dump; rows are prefiltered on their raw bytes so that only editions with an
+isbn_10 or isbn_13 containing a non-digit are decoded and validated
 """
 import argparse
+import backoff
 import datetime
 import isbnlib
-import gzip
-import json
 import logging
+import multiprocessing
+import re
 import sys
+import threading
+import time
 
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from itertools import islice
 from olclient.openlibrary import OpenLibrary
+from requests.adapters import HTTPAdapter
+from oldump.batch_isbn import ALLOWED_ISBN_CHARS, validate_isbns
+from oldump.checkpoint import has_seek_points, open_seekable, resume, save_checkpoint
+from oldump.reader import DumpRow
+from oldump.revisions import edition_from_json, unchanged_keys
 from os import makedirs
 
 
-ALLOWED_ISBN_CHARS = {'0', '1', '2', '3', '4', '5', '6', '7', '8', '9', 'X', 'x', '-'}
+# An isbn_10 or isbn_13 array with an element that is not all digits. ISBNs made up only of digits never need
+# normalization, so rows without a match are skipped before they are decoded.
+ISBN_WITH_NON_DIGITS = re.compile(rb'"isbn_1[03]": \[(?:"[0-9]*", )*"[0-9]*[^0-9"]')
+SCAN_CHUNK_SIZE = 10000  # dump rows handed to a scan worker at a time
+SAVE_MAX_TRIES = 5  # attempts at a save that keeps failing with a 5xx response
+
+# An edition with an ISBN that needs normalization; end_offset is the uncompressed dump offset after its row
+Candidate = namedtuple('Candidate', ['olid', 'isbns_by_type', 'revision', 'json', 'row', 'end_offset'])
 
 
 class NormalizeISBNJob(object):
-    def __init__(self, ol=None, dry_run=True, limit=1):
+    def __init__(self, ol=None, dry_run=True, limit=1, workers=1, fetch_window=20, fetch_concurrency=4,
+                 check_revisions=False, save_concurrency=1, save_queue_size=8, checkpoint_path=None,
+                 checkpoint_interval=300, resume=False):
         """Create logger and class variables"""
         if ol is None:
             self.ol = OpenLibrary()
@@ -28,6 +50,22 @@ class NormalizeISBNJob(object):
         self.changed = 0
         self.dry_run = dry_run
         self.limit = limit
+        self.workers = workers
+        self.fetch_window = fetch_window
+        self.fetch_concurrency = fetch_concurrency
+        self.check_revisions = check_revisions
+        self.save_concurrency = save_concurrency
+        self.save_queue_size = save_queue_size
+        self.save_queue = None
+        self.checkpoint_path = checkpoint_path
+        self.checkpoint_interval = checkpoint_interval
+        self.resume = resume
+        self.fetch_batches = 0  # windows of candidates fetched
+        self.fetched = 0  # editions fetched
+        self.fetch_seconds = 0.0  # summed latency of the edition GETs
+        self.reused = 0  # editions built from dump JSON because their revision had not changed
+        self.prefiltered = 0  # dump rows skipped before decoding
+        self._fetch_lock = threading.Lock()
 
         job_name = sys.argv[0].replace('.py', '')
         self.logger = logging.getLogger("jobs.%s" % job_name)
@@ -45,6 +83,9 @@ class NormalizeISBNJob(object):
         file_handler.setLevel(logging.DEBUG)
         file_handler.setFormatter(log_formatter)
         self.logger.addHandler(file_handler)
+        if self.checkpoint_path and not has_seek_points():
+            self.logger.warning('indexed_gzip is not installed: checkpoints will hold no gzip seek points, and a '
+                                'resumed run will decompress the dump from the start up to the checkpoint')
 
     @staticmethod
     def isbn_needs_normalization(isbn: str) -> bool:
@@ -64,66 +105,266 @@ class NormalizeISBNJob(object):
         """
         Performs ISBN normalization (removes hyphens and capitalizes letters)
 
-        dump_filepath -- path to *.txt.gz dump containing editions that need to be operated on
+        dump_filepath -- path to a *.txt or *.txt.gz dump (or oldump.delta delta) of the editions to operate on
+        With a checkpoint_path, progress is checkpointed every checkpoint_interval seconds once the edits made
+        so far are saved. A checkpoint never moves past an edition whose save failed, so resuming retries it.
+        With resume set, the run continues from that checkpoint.
         """
         if self.dry_run:
             self.logger.info('dry_run set to TRUE. Script will run, but no data will be modified.')
 
-        header = {'type': 0,
-                  'key': 1,
-                  'revision': 2,
-                  'last_modified': 3,
-                  'JSON': 4}
+        if self.resume and self.checkpoint_path:
+            fin, first_row, offset = resume(self.checkpoint_path, dump_filepath)
+            self.logger.info('Resuming %s at row %d' % (dump_filepath, first_row))
+        else:
+            fin, first_row, offset = open_seekable(dump_filepath), 0, 0
+
         comment = 'normalize ISBN'
-        with gzip.open(dump_filepath, 'rb') as fin:
-            for row_num, row in enumerate(fin):
-                row = row.decode().split('\t')
-                _json = json.loads(row[header['JSON']])
-                if _json['type']['key'] != '/type/edition': continue
-
-                isbns_by_type = dict()
-                if 'isbn_10' in _json:
-                    isbns_by_type['isbn_10'] = _json.get('isbn_10', None)
-                if 'isbn_13' in _json:
-                    isbns_by_type['isbn_13'] = _json.get('isbn_13', None)
-                if not isbns_by_type: continue
-
-                needs_normalization = any([
-                    self.isbn_needs_normalization(isbn)
-                    for isbns in isbns_by_type.values()
-                    for isbn in isbns
-                ])
-                if not needs_normalization: continue
-
-                olid = _json['key'].split('/')[-1]
-                edition = self.ol.Edition.get(olid)
+        self.ol.session.mount(self.ol.base_url,
+                              HTTPAdapter(pool_maxsize=self.fetch_concurrency + self.save_concurrency))
+        last_checkpoint = time.monotonic()
+        processed = None  # the last candidate handled
+        position = (first_row, offset)  # where to resume to handle the next candidate
+        with fin, SaveQueue(self.save_concurrency, self.save_queue_size, self.logger) as self.save_queue:
+            for candidate, edition in self.fetch_editions(self.find_candidates(fin, first_row, offset)):
+                if processed and self.checkpoint_path and time.monotonic() - last_checkpoint >= self.checkpoint_interval:
+                    self.checkpoint(fin, dump_filepath, processed.row + 1, processed.end_offset)
+                    last_checkpoint = time.monotonic()
+                processed, redo = candidate, position
+                position = (candidate.row + 1, candidate.end_offset)
+                olid, isbns_by_type = candidate.olid, candidate.isbns_by_type
                 if edition.type['key'] != '/type/edition': continue
 
+                changed = False
                 for isbn_type, isbns in isbns_by_type.items():  # if an ISBN is in the wrong field this script will not move it to the appropriate one
-                    normalized_isbns = list()
                     isbns = getattr(edition, isbn_type, [])
-                    for isbn in isbns:
-                        if self.isbn_needs_normalization(isbn):
-                            normalized_isbn = isbnlib.get_canonical_isbn(isbn)
-                            normalized_isbns.append(normalized_isbn)
-                        else:
-                            normalized_isbns.append(isbn)
+                    result = validate_isbns(isbns)
+                    normalized_isbns = [
+                        normalized_isbn if needs_normalization else isbn
+                        for isbn, normalized_isbn, needs_normalization
+                        in zip(isbns, result.canonical, result.needs_normalization)
+                    ]
                     normalized_isbns = dedupe(normalized_isbns)  # remove duplicates
                     if normalized_isbns != isbns and normalized_isbns != []:
                         setattr(edition, isbn_type, normalized_isbns)
                         self.logger.info('\t'.join([olid, str(isbns), str(normalized_isbns)]))
-                        self.save(lambda: edition.save(comment=comment))
+                        changed = True
+                if changed and not self.save(partial(edition.save, comment=comment), olid, redo):
+                    break
+            if processed and self.checkpoint_path:
+                self.checkpoint(fin, dump_filepath, processed.row + 1, processed.end_offset)
+        self.logger.info('%d dump rows skipped by the prefilter' % self.prefiltered)
+        self.logger.info('%d modifications made, %d saves failed' % (self.changed, self.save_queue.failed))
+
+    def checkpoint(self, fin, dump_filepath: str, row: int, offset: int) -> None:
+        """
+        Waits for the queued saves, then checkpoints the run to resume at row, which starts at offset, or at the
+        earliest failed save
+        """
+        self.save_queue.drain()
+        if self.save_queue.failed_positions:
+            row, offset = min(self.save_queue.failed_positions + [(row, offset)])
+            self.logger.warning('Checkpoint held at row %d, so a resumed run retries the failed saves' % row)
+        save_checkpoint(self.checkpoint_path, fin, dump_filepath, row, offset)
+        self.logger.info('Checkpoint saved at row %d' % row)
+
+    def find_candidates(self, rows, first_row: int = 0, offset: int = 0):
+        """
+        Yields a Candidate for every edition in rows with an ISBN that needs normalization, in dump order
+
+        rows -- iterable of raw dump rows (bytes)
+        first_row, offset -- row number and uncompressed dump offset of the first row
+        With more than one worker, chunks of rows are decoded and validated in a process pool. At most
+        two chunks per worker are in flight, so memory stays bounded however fast the dump is read.
+        """
+        def chunks():
+            row, chunk_offset = first_row, offset
+            for chunk in iter(lambda: list(islice(rows, SCAN_CHUNK_SIZE)), []):
+                yield chunk, row, chunk_offset
+                row += len(chunk)
+                chunk_offset += sum(map(len, chunk))
+
+        if self.workers <= 1:
+            for chunk in chunks():
+                yield from self._count_prefiltered(scan_rows(*chunk))
+            return
+
+        with multiprocessing.Pool(self.workers) as pool:
+            pending = deque()
+            for chunk in chunks():
+                pending.append(pool.apply_async(scan_rows, chunk))
+                if len(pending) >= 2 * self.workers:
+                    yield from self._count_prefiltered(pending.popleft().get())
+            while pending:
+                yield from self._count_prefiltered(pending.popleft().get())
+
+    def _count_prefiltered(self, scanned: tuple) -> list:
+        candidates, prefiltered = scanned
+        self.prefiltered += prefiltered
+        return candidates
+
+    def fetch_editions(self, candidates):
+        """
+        Yields (candidate, edition) for every candidate, in order
+
+        candidates -- iterable of Candidate as yielded by find_candidates
+        Candidates are gathered in windows of fetch_window OLIDs whose editions are fetched by
+        fetch_concurrency concurrent GETs over a shared connection pool. With check_revisions set, the
+        live revisions of a window are queried first and editions that did not change since the dump
+        are built from the dump JSON instead of being fetched.
+        """
+        try:
+            with ThreadPoolExecutor(max_workers=self.fetch_concurrency) as executor:
+                for window in iter(lambda: list(islice(candidates, self.fetch_window)), []):
+                    self.fetch_batches += 1
+                    unchanged = set()
+                    if self.check_revisions:
+                        unchanged = unchanged_keys(self.ol, {c.json['key']: c.revision for c in window})
+                    futures = [None if c.json['key'] in unchanged else executor.submit(self.fetch_edition, c.olid)
+                               for c in window]
+                    for candidate, future in zip(window, futures):
+                        if future is None:
+                            self.reused += 1
+                            yield candidate, edition_from_json(self.ol, candidate.json)
+                        else:
+                            yield candidate, future.result()
+        finally:
+            self.log_fetch_stats()
+
+    def fetch_edition(self, olid: str):
+        """Fetches a single edition, recording the request latency"""
+        start = time.perf_counter()
+        edition = self.ol.Edition.get(olid)
+        with self._fetch_lock:
+            self.fetched += 1
+            self.fetch_seconds += time.perf_counter() - start
+        return edition
 
-    def save(self, save_fn):
-        """Modify default save behavior based on 'limit' and 'dry_run' parameters"""
+    def log_fetch_stats(self):
+        """Logs edition fetch latency and how full the fetch windows were"""
+        if not self.fetch_batches:
+            return
+        self.logger.info('Fetched %d editions in %d windows (%.0f%% window fill, %.3fs mean latency), '
+                         'reused %d unchanged editions from the dump' % (
+                             self.fetched, self.fetch_batches,
+                             100.0 * (self.fetched + self.reused) / (self.fetch_batches * self.fetch_window),
+                             self.fetch_seconds / max(self.fetched, 1), self.reused))
+
+    def save(self, save_fn, olid: str = '', position: tuple = None) -> bool:
+        """
+        Modify default save behavior based on 'limit' and 'dry_run' parameters
+        Saves are queued on save_queue so the scan continues while they are in flight.
+        position -- (row, offset) a resumed run has to start at to redo this edit, should its save fail
+        Returns False once 'limit' is reached and no further modifications should be attempted.
+        """
         if not self.dry_run:
-            save_fn()
+            self.save_queue.submit(save_fn, olid, position)
         else:
             self.logger.info('Modification not made because dry_run is True')
         self.changed += 1
         if self.limit and self.changed >= self.limit:
             self.logger.info('Modification limit reached. Exiting script.')
-            sys.exit()
+            return False
+        return True
+
+
+class SaveQueue(object):
+    """
+    Runs save functions on a thread pool, at most max_in_flight at a time
+    submit() blocks while the queue is full. Saves answered with a 5xx status are retried with
+    exponential backoff. drain() and leaving the context wait for every queued save to finish.
+    The positions given with the saves that failed are kept in failed_positions.
+    """
+
+    def __init__(self, concurrency: int, max_in_flight: int, logger):
+        self.executor = ThreadPoolExecutor(max_workers=concurrency)
+        self.slots = threading.BoundedSemaphore(max(max_in_flight, concurrency))
+        self.logger = logger
+        self.saved = 0
+        self.failed = 0
+        self.failed_positions = []
+        self.in_flight = 0
+        self._done_condition = threading.Condition()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.executor.shutdown(wait=True)
+
+    def submit(self, save_fn, name: str = '', position: tuple = None) -> None:
+        self.slots.acquire()
+        with self._done_condition:
+            self.in_flight += 1
+        self.executor.submit(self._save, save_fn).add_done_callback(partial(self._done, name, position))
+
+    def drain(self) -> None:
+        with self._done_condition:
+            self._done_condition.wait_for(lambda: self.in_flight == 0)
+
+    @staticmethod
+    def _save(save_fn):
+        retrying = backoff.on_predicate(backoff.expo, lambda response: response.status_code >= 500,
+                                        max_tries=SAVE_MAX_TRIES)(save_fn)
+        response = retrying()
+        response.raise_for_status()
+        return response
+
+    def _done(self, name, position, future) -> None:
+        error = future.exception()
+        if error is not None:
+            self.logger.error('Save of %s failed: %s' % (name, error))
+        with self._done_condition:
+            if error is None:
+                self.saved += 1
+            else:
+                self.failed += 1
+                if position is not None:
+                    self.failed_positions.append(position)
+            self.in_flight -= 1
+            self._done_condition.notify_all()
+        self.slots.release()
+
+
+def scan_rows(rows: list, first_row: int = 0, offset: int = 0) -> tuple:
+    """
+    Returns a Candidate for every edition in rows with an ISBN that needs normalization, and the number of rows
+    that were skipped without being decoded
+    first_row, offset -- row number and uncompressed dump offset of rows[0]
+    Module level so that it can be run in a worker process
+    """
+    rows_isbns = list()
+    all_isbns = list()
+    prefiltered = 0
+    for row_num, line in enumerate(rows, first_row):
+        offset += len(line)
+        if not line.startswith(b'/type/edition\t') or not ISBN_WITH_NON_DIGITS.search(line):
+            prefiltered += 1
+            continue
+        row = DumpRow(line)
+        _json = row.json
+        if _json['type']['key'] != '/type/edition': continue
+
+        isbns_by_type = dict()
+        if 'isbn_10' in _json:
+            isbns_by_type['isbn_10'] = _json.get('isbn_10', None)
+        if 'isbn_13' in _json:
+            isbns_by_type['isbn_13'] = _json.get('isbn_13', None)
+        if not isbns_by_type: continue
+
+        start = len(all_isbns)
+        for isbns in isbns_by_type.values():
+            all_isbns.extend(isbns)
+        candidate = Candidate(row.olid, isbns_by_type, row.revision, _json, row_num, offset)
+        rows_isbns.append((candidate, start, len(all_isbns)))
+
+    # validate the ISBNs of the whole chunk at once
+    needs_normalization = validate_isbns(all_isbns).needs_normalization
+    candidates = list()
+    for candidate, start, end in rows_isbns:
+        if needs_normalization[start:end].any():
+            candidates.append(candidate)
+    return candidates, prefiltered
 
 
 def str2bool(value):
@@ -149,15 +390,37 @@ def dedupe(input: list) -> list:
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description=__doc__)
     parser.add_argument('--dump_path', type=str, default=None,
-                        help='Path to *.txt.gz containing OpenLibrary editions data')
+                        help='Path to *.txt.gz containing OpenLibrary editions data, e.g. a complete dump')
     parser.add_argument('--limit', type=int, default=1,
                         help='Limit number of edits performed on OpenLibrary data. Set to zero to allow unlimited edits')
     parser.add_argument('--dry-run', type=str2bool, default=True,
                         help="Don't actually perform edits on Open Library")
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Number of processes used to decode and validate dump rows')
+    parser.add_argument('--fetch-window', type=int, default=20,
+                        help='Number of candidate editions gathered before they are fetched from Open Library')
+    parser.add_argument('--fetch-concurrency', type=int, default=4,
+                        help='Number of concurrent requests used to fetch a window of editions')
+    parser.add_argument('--check-revisions', type=str2bool, default=False,
+                        help='Reuse the dump JSON of editions whose revision has not changed since the dump')
+    parser.add_argument('--save-concurrency', type=int, default=1,
+                        help='Number of concurrent saves to Open Library')
+    parser.add_argument('--save-queue-size', type=int, default=8,
+                        help='Maximum number of saves in flight before the scan waits')
+    parser.add_argument('--checkpoint', type=str, default=None,
+                        help='Path of a checkpoint file that progress is saved to periodically')
+    parser.add_argument('--checkpoint-interval', type=int, default=300,
+                        help='Seconds between checkpoints')
+    parser.add_argument('--resume', type=str2bool, default=False,
+                        help='Resume from the checkpoint instead of starting at the beginning of the dump')
     _args = parser.parse_args()
 
     _ol = OpenLibrary()
-    bot = NormalizeISBNJob(ol=_ol, dry_run=_args.dry_run, limit=_args.limit)
+    bot = NormalizeISBNJob(ol=_ol, dry_run=_args.dry_run, limit=_args.limit, workers=_args.workers,
+                           fetch_window=_args.fetch_window, fetch_concurrency=_args.fetch_concurrency,
+                           check_revisions=_args.check_revisions, save_concurrency=_args.save_concurrency,
+                           save_queue_size=_args.save_queue_size, checkpoint_path=_args.checkpoint,
+                           checkpoint_interval=_args.checkpoint_interval, resume=_args.resume)
     bot.console_handler.setLevel(logging.INFO)
 
     try:
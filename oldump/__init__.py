@@ -0,0 +1 @@
+"""Helpers shared by the bots that work from Open Library dumps"""
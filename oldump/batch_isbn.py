@@ -0,0 +1,169 @@
+"""
+Batch ISBN validation
+Validates thousands of raw ISBN strings at once, doing the character filtering and checksums as NumPy array math.
+Results are identical to the per-string isbnlib calls (see tests/oldump/test_batch_isbn.py):
+    canonical           -- isbnlib.get_canonical_isbn(isbn), '' if there is none
+    valid               -- not isbnlib.notisbn(isbn)
+    isbn13              -- the canonical ISBN converted to ISBN-13, '' if there is none
+    needs_normalization -- isbnbot's NormalizeISBNJob.isbn_needs_normalization(isbn)
+Strings that are not made up solely of digits, 'X', 'x' and '-' are rare in the dumps and are handed to isbnlib.
+"""
+from collections import namedtuple
+
+import isbnlib
+import numpy as np
+
+
+ISBNBatchResult = namedtuple('ISBNBatchResult', ['canonical', 'valid', 'isbn13', 'needs_normalization'])
+
+ALLOWED_ISBN_CHARS = {'0', '1', '2', '3', '4', '5', '6', '7', '8', '9', 'X', 'x', '-'}
+WIDTH = 32  # longer strings are handed to isbnlib
+# get_canonical_isbn() matches this pattern at the start of the string; other isbnlib releases only agree on hyphen-free input
+RE_NORMAL_PATTERN = r'97[89]{1}(?:-?\d){10}|\d{9}[0-9X]{1}|[-0-9X]{10,16}'
+HYPHENS_SUPPORTED = isbnlib.RE_NORMAL.pattern == RE_NORMAL_PATTERN
+
+ZERO, NINE, UPPER_X, LOWER_X, HYPHEN = b'09Xx-'
+ISBN10_WEIGHTS = np.arange(10, 1, -1)
+ISBN13_WEIGHTS = np.tile([1, 3], 6)
+SPECIAL_CASES = [np.frombuffer(isbn.ljust(13, b'\0'), dtype=np.uint8)
+                 for isbn in (b'0000000000', b'0000000000000', b'000000000X')]
+
+
+def validate_isbns(isbns: list) -> ISBNBatchResult:
+    """Validates and normalizes a list of raw ISBN strings, see module docstring"""
+    count = len(isbns)
+    canonical = [''] * count
+    isbn13 = [''] * count
+    valid = np.zeros(count, dtype=bool)
+    needs_normalization = np.zeros(count, dtype=bool)
+
+    fast = [i for i, isbn in enumerate(isbns) if len(isbn) <= WIDTH and isbn.isascii()]
+    if fast:
+        chars = np.array([isbns[i] for i in fast], dtype='S%d' % WIDTH).view(np.uint8).reshape(len(fast), WIDTH)
+        lengths = np.fromiter((len(isbns[i]) for i in fast), dtype=np.intp, count=len(fast))
+        in_string = np.arange(WIDTH) < lengths[:, None]
+        allowed = (chars >= ZERO) & (chars <= NINE) | (chars == UPPER_X) | (chars == LOWER_X) | (chars == HYPHEN)
+        simple = np.all(allowed | ~in_string, axis=1)
+        if not HYPHENS_SUPPORTED:
+            simple &= ~np.any(chars == HYPHEN, axis=1)
+        fast = np.asarray(fast)[simple]
+        _validate_simple(chars[simple], lengths[simple], fast, canonical, valid, isbn13, needs_normalization)
+        slow = sorted(set(range(count)).difference(fast.tolist()))
+    else:
+        slow = range(count)
+
+    for i in slow:
+        canonical[i], valid[i], isbn13[i], needs_normalization[i] = validate_isbn(isbns[i])
+    return ISBNBatchResult(canonical, valid, isbn13, needs_normalization)
+
+
+def validate_isbn(isbn: str) -> tuple:
+    """Per-string isbnlib equivalent of validate_isbns()"""
+    try:
+        canonical = isbnlib.get_canonical_isbn(isbn) or ''
+    except IndexError:  # older isbnlib releases fail when the match canonicalizes to ''
+        canonical = ''
+    valid = not isbnlib.notisbn(isbn)
+    isbn13 = isbnlib.to_isbn13(canonical) if len(canonical) == 10 else canonical
+    needs_normalization = (set(isbn.strip()).issubset(ALLOWED_ISBN_CHARS) and valid
+                           and bool(canonical) and canonical != isbn)
+    return canonical, valid, isbn13, needs_normalization
+
+
+def _validate_simple(chars, lengths, rows, canonical, valid, isbn13, needs_normalization):
+    """Fills in the results for rows whose characters are all digits, 'X', 'x' or '-'"""
+    is_digit = (chars >= ZERO) & (chars <= NINE)
+    is_x = (chars == UPPER_X) | (chars == LOWER_X)
+    is_hyphen = chars == HYPHEN
+    columns = np.arange(WIDTH)
+
+    # notisbn() canonicalizes the whole string
+    isbn, isbn_length = _canonical(chars, is_digit | is_x)
+    is_valid = np.where(isbn_length == 10, _isbn10_ok(isbn),
+                        (isbn_length == 13) & _isbn13_ok(isbn) & _has_isbn13_prefix(isbn))
+
+    # get_canonical_isbn() canonicalizes the leftmost RE_NORMAL match, which for these strings starts at 0:
+    # 97[89] followed by ten optionally hyphen-prefixed digits, else nine digits and a check character,
+    # else the first 16 characters
+    digits_seen = np.cumsum(is_digit[:, 3:], axis=1)
+    has_ten = digits_seen[:, -1] >= 10
+    tenth_digit = np.argmax(digits_seen >= 10, axis=1) + 3
+    in_prefix = (columns >= 3) & (columns <= tenth_digit[:, None])
+    double_hyphen = np.zeros_like(is_hyphen)
+    double_hyphen[:, 1:] = is_hyphen[:, 1:] & is_hyphen[:, :-1]
+    match_13 = (_has_isbn13_prefix(chars) & has_ten
+                & ~np.any(in_prefix & (is_x | double_hyphen), axis=1))
+    match_10 = np.all(is_digit[:, :9], axis=1) & (is_digit[:, 9] | is_x[:, 9])
+    match_end = np.where(match_13, tenth_digit + 1, np.where(match_10, 10, np.minimum(lengths, 16)))
+    match_end[lengths < 10] = 0
+    match, match_length = _canonical(chars, (is_digit | is_x) & (columns < match_end[:, None]))
+    match_ok = np.where(match_length == 10, _isbn10_ok(match), (match_length == 13) & _isbn13_ok(match))
+    match[~match_ok] = 0
+    match_length[~match_ok] = 0
+
+    converted = match.copy()
+    from_10 = match_length == 10
+    converted[from_10, 3:12] = match[from_10, :9]
+    converted[from_10, :3] = np.frombuffer(b'978', dtype=np.uint8)
+    converted[from_10, 12] = _check_digit13(converted[from_10])
+
+    unchanged = (match_length == lengths) & np.all(match == chars[:, :13], axis=1)
+    is_normalizable = is_valid & match_ok & ~unchanged
+
+    match_strings = _to_strings(match)
+    converted_strings = _to_strings(converted)
+    for i, row in enumerate(rows.tolist()):
+        canonical[row] = match_strings[i]
+        isbn13[row] = converted_strings[i]
+    valid[rows] = is_valid
+    needs_normalization[rows] = is_normalizable
+
+
+def _canonical(chars, keep):
+    """
+    Vectorized isbnlib.canonical() of the characters selected by keep
+    Returns the 13 wide left-aligned canonical ISBNs and their lengths, 0 where canonical() returns ''
+    """
+    length = keep.sum(axis=1)
+    order = np.argsort(~keep, axis=1, kind='stable')[:, :13]
+    isbn = np.take_along_axis(chars, order, axis=1)
+    isbn[np.arange(13) >= length[:, None]] = 0
+    rows = np.arange(len(isbn))
+    last = np.clip(length - 1, 0, 12)
+    isbn[rows, last] = np.where(isbn[rows, last] == LOWER_X, UPPER_X, isbn[rows, last])
+
+    is_upper_x = isbn == UPPER_X
+    first_x = np.where(is_upper_x.any(axis=1), np.argmax(is_upper_x, axis=1), 9)
+    ok = (((length == 10) | (length == 13)) & (first_x == 9) & ~np.any(isbn == LOWER_X, axis=1))
+    for special in SPECIAL_CASES:
+        ok &= ~np.all(isbn == special, axis=1)
+    isbn[~ok] = 0
+    return isbn, np.where(ok, length, 0)
+
+
+def _check_digit10(isbn):
+    remainder = ((isbn[:, :9].astype(np.intp) - ZERO) @ ISBN10_WEIGHTS) % 11
+    check = np.where(remainder == 0, 0, 11 - remainder)
+    return np.where(check == 10, UPPER_X, check + ZERO).astype(np.uint8)
+
+
+def _check_digit13(isbn):
+    check = 10 - ((isbn[:, :12].astype(np.intp) - ZERO) @ ISBN13_WEIGHTS) % 10
+    return (np.where(check == 10, 0, check) + ZERO).astype(np.uint8)
+
+
+def _isbn10_ok(isbn):
+    return _check_digit10(isbn) == isbn[:, 9]
+
+
+def _isbn13_ok(isbn):
+    digits = np.all((isbn[:, :13] >= ZERO) & (isbn[:, :13] <= NINE), axis=1)
+    return digits & (_check_digit13(isbn) == isbn[:, 12])
+
+
+def _has_isbn13_prefix(isbn):
+    return (isbn[:, 0] == ord('9')) & (isbn[:, 1] == ord('7')) & ((isbn[:, 2] == ord('8')) | (isbn[:, 2] == ord('9')))
+
+
+def _to_strings(isbn):
+    return np.ascontiguousarray(isbn).view('S13').ravel().astype('U13').tolist()
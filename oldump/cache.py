@@ -0,0 +1,159 @@
+"""
+SQLite cache of the edition fields the bots query
+build_cache() reads an editions dump once and projects key, revision, ISBNs, ocaid, whether there are covers,
+works and source records into an SQLite database, so questions that used to take a zgrep over the whole dump are
+answered from indexes instead. Rows are bulk inserted with the indexes created afterwards, in WAL mode.
+
+Usage:
+    python -m oldump.cache ol_dump_editions_latest.txt.gz editions.sqlite
+"""
+import argparse
+import logging
+import os
+import sqlite3
+
+from itertools import islice
+
+from oldump.olid import pack_olid
+from oldump.reader import read_dump
+
+INSERT_BATCH_SIZE = 50000
+
+SCHEMA = '''
+CREATE TABLE editions (
+    olid INTEGER PRIMARY KEY,  -- oldump.olid.pack_olid(key)
+    key TEXT NOT NULL,
+    revision INTEGER NOT NULL,
+    ocaid TEXT,
+    has_covers INTEGER NOT NULL
+);
+CREATE TABLE isbns (edition INTEGER NOT NULL, isbn TEXT NOT NULL, isbn_type INTEGER NOT NULL);  -- 10 or 13
+CREATE TABLE works (edition INTEGER NOT NULL, work TEXT NOT NULL);
+CREATE TABLE source_records (edition INTEGER NOT NULL, source_record TEXT NOT NULL);
+'''
+INDEXES = '''
+CREATE INDEX editions_ocaid ON editions (ocaid) WHERE ocaid IS NOT NULL;
+CREATE INDEX editions_coverless_with_ocaid ON editions (olid) WHERE ocaid IS NOT NULL AND NOT has_covers;
+CREATE INDEX isbns_isbn ON isbns (isbn);
+CREATE INDEX isbns_edition ON isbns (edition);
+CREATE INDEX works_work ON works (work);
+CREATE INDEX source_records_source_record ON source_records (source_record);
+'''
+
+logger = logging.getLogger('oldump.cache')
+
+
+def project(row) -> tuple:
+    """Returns the editions, isbns, works and source_records rows for a dump row"""
+    _json = row.json
+    olid = pack_olid(row.key)
+    # any covers field counts, even an empty one, as coverbot's dump scan only looks for '"covers":'
+    return ((olid, row.key, row.revision, _json.get('ocaid') or None, 'covers' in _json),
+            [(olid, isbn, 10) for isbn in _json.get('isbn_10', [])] +
+            [(olid, isbn, 13) for isbn in _json.get('isbn_13', [])],
+            [(olid, work['key']) for work in _json.get('works', []) if isinstance(work, dict) and 'key' in work],
+            [(olid, record) for record in _json.get('source_records', [])])
+
+
+def build_cache(dump_path: str, db_path: str, batch_size: int = INSERT_BATCH_SIZE) -> int:
+    """Builds the cache of the editions in dump_path at db_path, replacing any earlier one, and returns its size"""
+    tmp_path = db_path + '.tmp'
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    db = sqlite3.connect(tmp_path)
+    count = 0
+    try:
+        db.execute('PRAGMA journal_mode = WAL')
+        db.execute('PRAGMA synchronous = OFF')  # a failed build is rebuilt from the dump, never resumed
+        db.executescript(SCHEMA)
+        rows = read_dump(dump_path, type_prefix='/type/edition')
+        for batch in iter(lambda: list(islice(rows, batch_size)), []):
+            projected = {}  # by olid, so the last row of a key repeated in the batch wins
+            for row in batch:
+                try:
+                    projected[pack_olid(row.key)] = project(row)
+                except (ValueError, AttributeError, TypeError) as e:
+                    logger.warning('Skipping %s: %s' % (row.key, e))
+            editions, isbns, works, source_records = [], [], [], []
+            for edition, _isbns, _works, _source_records in projected.values():
+                editions.append(edition)
+                isbns += _isbns
+                works += _works
+                source_records += _source_records
+            # a key already inserted by an earlier batch is rare, but its rows are replaced, not added to
+            replaced = [(olid,) for olid in projected
+                        if db.execute('SELECT 1 FROM editions WHERE olid = ?', (olid,)).fetchone()]
+            with db:
+                for table in ('isbns', 'works', 'source_records'):
+                    db.executemany('DELETE FROM %s WHERE edition = ?' % table, replaced)
+                db.executemany('INSERT OR REPLACE INTO editions VALUES (?, ?, ?, ?, ?)', editions)
+                db.executemany('INSERT INTO isbns VALUES (?, ?, ?)', isbns)
+                db.executemany('INSERT INTO works VALUES (?, ?)', works)
+                db.executemany('INSERT INTO source_records VALUES (?, ?)', source_records)
+        count = db.execute('SELECT COUNT(*) FROM editions').fetchone()[0]
+        db.executescript(INDEXES)
+        db.execute('ANALYZE')
+    finally:
+        db.close()
+    for suffix in ('-wal', '-shm'):  # left behind by a reader of the cache being replaced
+        if os.path.exists(db_path + suffix):
+            os.remove(db_path + suffix)
+    os.replace(tmp_path, db_path)
+    return count
+
+
+class EditionCache(object):
+    """Read-only queries over a cache built by build_cache()"""
+
+    def __init__(self, db_path: str):
+        if not os.path.exists(db_path):
+            raise FileNotFoundError(db_path)
+        self.db = sqlite3.connect('file:%s?mode=ro' % db_path, uri=True, check_same_thread=False)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return self.db.execute('SELECT COUNT(*) FROM editions').fetchone()[0]
+
+    def close(self) -> None:
+        self.db.close()
+
+    def coverless_with_ocaid(self):
+        """Yields (key, revision, ocaid) of the editions with an ocaid but no covers"""
+        return self.db.execute('SELECT key, revision, ocaid FROM editions '
+                               'WHERE ocaid IS NOT NULL AND NOT has_covers ORDER BY olid')
+
+    def editions_by_ocaid(self, ocaid: str) -> list:
+        return [key for key, in self.db.execute('SELECT key FROM editions WHERE ocaid = ?', (ocaid,))]
+
+    def editions_by_isbn(self, isbn: str) -> list:
+        """Returns the keys of the editions listing isbn exactly as given"""
+        return [key for key, in self.db.execute('SELECT DISTINCT key FROM isbns JOIN editions ON olid = edition '
+                                                'WHERE isbn = ?', (isbn,))]
+
+    def editions_by_work(self, work_key: str) -> list:
+        return [key for key, in self.db.execute('SELECT key FROM works JOIN editions ON olid = edition '
+                                                'WHERE work = ?', (work_key,))]
+
+    def editions_by_source_record(self, source_record: str) -> list:
+        return [key for key, in self.db.execute('SELECT key FROM source_records JOIN editions ON olid = edition '
+                                                'WHERE source_record = ?', (source_record,))]
+
+    def isbns_with_non_digits(self):
+        """Yields (key, revision, isbn_type, isbn) of the ISBNs that are not all digits, the ones isbnbot fixes"""
+        return self.db.execute("SELECT key, revision, isbn_type, isbn FROM isbns JOIN editions ON olid = edition "
+                               "WHERE isbn GLOB '*[^0-9]*' ORDER BY olid")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('dump_path', help='Path to an Open Library editions dump, *.txt or *.txt.gz')
+    parser.add_argument('db_path', help='Path of the SQLite database to build')
+    _args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    logger.info('Cached %d editions' % build_cache(_args.dump_path, _args.db_path))
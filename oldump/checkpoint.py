@@ -0,0 +1,89 @@
+"""
+Checkpoints for resuming long runs over dumps
+A checkpoint records the next dump row to process and its offset in the uncompressed dump. A plain dump is resumed
+with a seek to that offset. For gzip dumps the checkpoint also holds, when indexed_gzip is installed, an index of
+gzip seek points (snapshots of the 32KiB deflate window every SEEK_POINT_SPACING bytes, as in zlib's zran example).
+Resuming then only inflates the data between the nearest seek point and the checkpoint. indexed_gzip is listed in
+the requirements; without it the prefix is inflated again, but not parsed, and a warning is logged when
+checkpointing is turned on.
+"""
+import gzip
+import json
+import logging
+import os
+
+try:
+    import indexed_gzip
+except ImportError:
+    indexed_gzip = None
+
+from oldump.reader import is_gzip
+
+SEEK_POINT_SPACING = 16 * 1024 * 1024  # uncompressed bytes between gzip seek points
+
+logger = logging.getLogger('oldump.checkpoint')
+
+
+def has_seek_points() -> bool:
+    """Returns whether gzip seek points are recorded, i.e. whether resuming skips inflating the dump prefix"""
+    return indexed_gzip is not None
+
+
+def open_gzip(path: str, index_path: str = None, spacing: int = SEEK_POINT_SPACING):
+    """
+    Opens a gzip file for binary reading, recording seek points as it is read if indexed_gzip is installed
+    index_path -- seek points exported by an earlier run over the same file
+    spacing -- uncompressed bytes between seek points
+    """
+    if indexed_gzip is None:
+        if index_path:
+            logger.warning('indexed_gzip is not installed, %s will be inflated from the start' % path)
+        return gzip.open(path, 'rb')
+    if index_path and os.path.exists(index_path):
+        return indexed_gzip.IndexedGzipFile(path, spacing=spacing, index_file=index_path)
+    return indexed_gzip.IndexedGzipFile(path, spacing=spacing)
+
+
+def open_seekable(path: str, index_path: str = None):
+    """Opens a plain or gzip dump for binary reading so that it can be checkpointed; see open_gzip()"""
+    if is_gzip(path):
+        return open_gzip(path, index_path)
+    return open(path, 'rb')
+
+
+def load_checkpoint(checkpoint_path: str) -> dict:
+    """Returns the checkpoint saved at checkpoint_path ({'dump_path', 'row', 'offset', 'index'}), or None"""
+    if not os.path.exists(checkpoint_path):
+        return None
+    with open(checkpoint_path) as fin:
+        return json.load(fin)
+
+
+def save_checkpoint(checkpoint_path: str, fin, dump_path: str, row: int, offset: int) -> None:
+    """
+    Atomically saves a checkpoint for resuming at row, which starts at offset in the uncompressed dump
+    fin -- the file returned by open_seekable(dump_path); gzip seek points are exported next to the checkpoint
+    """
+    index_path = None
+    if hasattr(fin, 'export_index'):
+        index_path = checkpoint_path + '.idx'
+        fin.export_index(index_path + '.tmp')
+        os.replace(index_path + '.tmp', index_path)
+    with open(checkpoint_path + '.tmp', 'w') as fout:
+        json.dump({'dump_path': dump_path, 'row': row, 'offset': offset, 'index': index_path}, fout)
+        fout.flush()
+        os.fsync(fout.fileno())
+    os.replace(checkpoint_path + '.tmp', checkpoint_path)
+
+
+def resume(checkpoint_path: str, dump_path: str):
+    """
+    Opens dump_path positioned at the checkpoint saved for it at checkpoint_path
+    Returns (file, row, offset); row and offset are 0 when there is no checkpoint for dump_path.
+    """
+    checkpoint = load_checkpoint(checkpoint_path)
+    if checkpoint is None or checkpoint['dump_path'] != dump_path:
+        return open_seekable(dump_path), 0, 0
+    fin = open_seekable(dump_path, checkpoint['index'])
+    fin.seek(checkpoint['offset'])
+    return fin, checkpoint['row'], checkpoint['offset']
@@ -0,0 +1,173 @@
+"""
+Decompression backends for gzip dumps
+gzip.open inflates on the thread that parses the rows, so a dump scan pays for both one after the other. The
+backends here inflate somewhere else and hand the raw byte blocks over through a bounded buffer, so inflation
+overlaps with parsing:
+
+    pigz    -- a `pigz -dc` subprocess; the OS pipe is the buffer
+    thread  -- a thread inflating with zlib, which releases the GIL while it works
+    process -- the same loop in a separate process
+    gzip    -- the stdlib gzip module, inflating on the reading thread
+
+'auto' picks pigz when it is on the PATH and the thread backend otherwise. Any backend that cannot start falls
+back to gzip. All of them return a binary file supporting read(), readline() and line iteration, but not seek().
+"""
+import gzip
+import io
+import logging
+import multiprocessing
+import queue
+import shutil
+import subprocess
+import threading
+import zlib
+
+BACKENDS = ('auto', 'pigz', 'thread', 'process', 'gzip')
+BLOCK_SIZE = 1024 * 1024  # compressed bytes read at a time
+BUFFERED_BLOCKS = 16  # inflated blocks held between the inflater and the reader
+PUT_TIMEOUT = 0.1  # seconds between checks for a reader that stopped early
+
+logger = logging.getLogger('oldump.decompress')
+
+
+def inflate_blocks(fin, block_size: int = BLOCK_SIZE):
+    """Yields the inflated contents of the (possibly multi-member) gzip file fin in blocks"""
+    inflater = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    started = False
+    for data in iter(lambda: fin.read(block_size), b''):
+        while data:
+            started = True
+            block = inflater.decompress(data)
+            if block:
+                yield block
+            if not inflater.eof:
+                break
+            # gzip members may be followed by another member, or by zero padding like gzip.open allows
+            data = inflater.unused_data.lstrip(b'\x00')
+            inflater = zlib.decompressobj(16 + zlib.MAX_WBITS)
+            started = False
+    if started and not inflater.eof:
+        raise EOFError('Compressed file ended before the end-of-stream marker was reached')
+
+
+def _put(blocks, item, stop) -> bool:
+    """Puts item on blocks, waiting for room unless the reader stops; returns False if it did"""
+    while not stop.is_set():
+        try:
+            blocks.put(item, timeout=PUT_TIMEOUT)
+            return True
+        except queue.Full:
+            pass
+    return False
+
+
+def _inflate_into(path: str, blocks, stop) -> None:
+    """Inflates path onto blocks; ends with None, or with the exception that stopped it"""
+    try:
+        with open(path, 'rb') as fin:
+            for block in inflate_blocks(fin):
+                if not _put(blocks, block, stop):
+                    return
+        _put(blocks, None, stop)
+    except Exception as e:
+        _put(blocks, e, stop)
+
+
+class BlockReader(io.RawIOBase):
+    """Raw reader over the blocks an inflater thread or process puts on a bounded queue"""
+
+    def __init__(self, blocks, stop, worker):
+        self.blocks = blocks
+        self.stop = stop
+        self.worker = worker
+        self.pending = memoryview(b'')
+        self.eof = False
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        while not self.pending and not self.eof:
+            block = self.blocks.get()
+            if block is None:
+                self.eof = True
+            elif isinstance(block, BaseException):
+                self.eof = True
+                raise block
+            else:
+                self.pending = memoryview(block)
+        size = min(len(buffer), len(self.pending))
+        buffer[:size] = self.pending[:size]
+        self.pending = self.pending[size:]
+        return size
+
+    def close(self) -> None:
+        if not self.closed:
+            self.stop.set()
+            if isinstance(self.worker, multiprocessing.Process):
+                self.worker.terminate()
+            self.worker.join()
+        super().close()
+
+
+class SubprocessReader(io.RawIOBase):
+    """Raw reader over the stdout of a decompressing subprocess; raises if it exits with an error"""
+
+    def __init__(self, args: list):
+        self.args = args
+        self.process = subprocess.Popen(args, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        size = self.process.stdout.readinto(buffer)
+        if not size and self.process.wait():
+            raise OSError('%s exited with %d: %s' % (' '.join(self.args), self.process.returncode,
+                                                     self.process.stderr.read().decode(errors='replace').strip()))
+        return size
+
+    def close(self) -> None:
+        if not self.closed:
+            if self.process.poll() is None:
+                self.process.kill()
+            self.process.wait()
+            self.process.stdout.close()
+            self.process.stderr.close()
+        super().close()
+
+
+def open_pigz(path: str):
+    return io.BufferedReader(SubprocessReader(['pigz', '-dc', path]), buffer_size=BLOCK_SIZE)
+
+
+def open_inflater(path: str, use_process: bool = False):
+    if use_process:
+        blocks, stop = multiprocessing.Queue(BUFFERED_BLOCKS), multiprocessing.Event()
+        worker = multiprocessing.Process(target=_inflate_into, args=(path, blocks, stop), daemon=True)
+    else:
+        blocks, stop = queue.Queue(BUFFERED_BLOCKS), threading.Event()
+        worker = threading.Thread(target=_inflate_into, args=(path, blocks, stop), daemon=True)
+    worker.start()
+    return io.BufferedReader(BlockReader(blocks, stop, worker), buffer_size=BLOCK_SIZE)
+
+
+def open_gzip_stream(path: str, backend: str = 'auto'):
+    """
+    Opens a gzip file for sequential binary reading, inflating it with backend (see BACKENDS)
+    Falls back to the stdlib gzip module when backend is unavailable.
+    """
+    if backend not in BACKENDS:
+        raise ValueError('Unknown decompression backend: %s' % backend)
+    if backend == 'auto':
+        backend = 'pigz' if shutil.which('pigz') else 'thread'
+    try:
+        if backend == 'pigz':
+            if shutil.which('pigz') is None:
+                raise OSError('pigz is not on the PATH')
+            return open_pigz(path)
+        elif backend in ('thread', 'process'):
+            return open_inflater(path, use_process=backend == 'process')
+    except OSError as e:
+        logger.warning('%s decompression is unavailable (%s), using gzip' % (backend, e))
+    return gzip.open(path, 'rb')
@@ -0,0 +1,97 @@
+"""
+Differences between two dumps
+diff_dumps() merge-joins an older and a newer dump sorted by key, holding one row of each in memory, and yields
+the records that were added, removed or whose revision changed. Sort dumps by key with
+
+    zcat ol_dump_editions.txt.gz | LC_ALL=C sort -t$'\\t' -k2,2 -S 2G | gzip > ol_dump_editions_sorted.txt.gz
+
+Run as a script, it writes the new rows of added and changed records as a dump of their own, so every bot that
+reads dumps can work through just the delta, and optionally the keys of removed records:
+
+    python -m oldump.delta old_sorted.txt.gz new_sorted.txt.gz delta.txt.gz --removed=removed.txt
+"""
+import argparse
+import gzip
+import logging
+
+from collections import Counter, namedtuple
+
+from oldump.reader import read_dump
+
+ADDED = 'added'
+REMOVED = 'removed'
+CHANGED = 'changed'
+
+# kind is ADDED, REMOVED or CHANGED; old and new are the DumpRows on either side, None when absent
+Change = namedtuple('Change', ['kind', 'old', 'new'])
+
+logger = logging.getLogger('oldump.delta')
+
+
+def sorted_rows(dump, type_prefix: str = None, decompress: str = 'auto'):
+    """Yields (key, DumpRow) for the rows of dump, raising ValueError if their keys are not strictly ascending"""
+    previous = None
+    for row in read_dump(dump, type_prefix, decompress=decompress):
+        key = row.fields[1]
+        if previous is not None and key <= previous:
+            raise ValueError('%s is not sorted by key: %s follows %s' % (dump, key.decode(), previous.decode()))
+        previous = key
+        yield key, row
+
+
+def diff_dumps(old_dump, new_dump, type_prefix: str = None, decompress: str = 'auto'):
+    """
+    Yields a Change for every record added to, removed from or with a new revision in new_dump, in key order
+    old_dump, new_dump -- paths or binary files of dumps sorted by key
+    type_prefix -- only compare rows whose type starts with this, e.g. '/type/edition'
+    """
+    old_rows = sorted_rows(old_dump, type_prefix, decompress)
+    new_rows = sorted_rows(new_dump, type_prefix, decompress)
+    old, new = next(old_rows, None), next(new_rows, None)
+    while old is not None or new is not None:
+        if new is None or (old is not None and old[0] < new[0]):
+            yield Change(REMOVED, old[1], None)
+            old = next(old_rows, None)
+        elif old is None or new[0] < old[0]:
+            yield Change(ADDED, None, new[1])
+            new = next(new_rows, None)
+        else:
+            if old[1].fields[2] != new[1].fields[2]:
+                yield Change(CHANGED, old[1], new[1])
+            old, new = next(old_rows, None), next(new_rows, None)
+
+
+def write_delta(changes, delta_path: str, removed_path: str = None) -> Counter:
+    """
+    Writes the new rows of added and changed records to delta_path (gzip compressed if it ends in .gz) and the
+    keys of removed records to removed_path, if given. Returns the number of changes of each kind.
+    """
+    counts = Counter()
+    removed = open(removed_path, 'w') if removed_path else None
+    try:
+        with (gzip.open if delta_path.endswith('.gz') else open)(delta_path, 'wb') as fout:
+            for change in changes:
+                counts[change.kind] += 1
+                if change.new is not None:
+                    fout.write(change.new.line)
+                elif removed is not None:
+                    removed.write(change.old.key + '\n')
+    finally:
+        if removed is not None:
+            removed.close()
+    return counts
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('old_dump', help='Older dump, sorted by key')
+    parser.add_argument('new_dump', help='Newer dump, sorted by key')
+    parser.add_argument('delta_path', help='Path to *.txt(.gz) the added and changed rows of new_dump are written to')
+    parser.add_argument('--removed', help='Path the keys of records missing from new_dump are written to')
+    parser.add_argument('--type-prefix', help='Only compare rows of this type, e.g. /type/edition')
+    _args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    _counts = write_delta(diff_dumps(_args.old_dump, _args.new_dump, _args.type_prefix), _args.delta_path,
+                          _args.removed)
+    logger.info('%d added, %d changed, %d removed' % (_counts[ADDED], _counts[CHANGED], _counts[REMOVED]))
@@ -0,0 +1,179 @@
+"""
+OLID -> row sidecar index for random access into dumps
+build_index() reads a dump once and writes <dump>.olidx: the rows' packed OLIDs (see oldump.olid) sorted, next to
+each row's offset and length in the uncompressed dump. DumpIndex memory maps that file and binary searches it,
+so a lookup costs O(log n) page reads however large the dump is. Plain dumps are memory mapped too; for gzip dumps
+the seek points indexed_gzip recorded while building are exported to <dump>.olidx.gzidx, so a lookup inflates at
+most INDEX_SEEK_POINT_SPACING bytes from the nearest seek point. Gzip dumps are refused without indexed_gzip or
+their .gzidx, since every lookup would then inflate the dump from its start.
+
+Usage:
+    python -m oldump.index ol_dump_editions_latest.txt.gz
+    python -m oldump.index ol_dump_editions_latest.txt.gz --lookup OL7353617M
+"""
+import argparse
+import logging
+import mmap
+import os
+import struct
+import threading
+
+from array import array
+
+import numpy as np
+
+from oldump.checkpoint import has_seek_points, open_gzip
+from oldump.olid import pack_olid
+from oldump.reader import DumpRow, is_gzip
+
+INDEX_SUFFIX = '.olidx'
+GZIP_INDEX_SUFFIX = '.gzidx'
+INDEX_SEEK_POINT_SPACING = 4 * 1024 * 1024  # uncompressed bytes between gzip seek points
+MAGIC = b'OLIDX\x00\x00\x01'
+# magic, row count, size of the dump file, flags
+HEADER = struct.Struct('<8sQQQ')
+GZIP_FLAG = 1
+
+logger = logging.getLogger('oldump.index')
+
+
+def build_index(dump_path: str, index_path: str = None, type_prefix: str = None) -> int:
+    """
+    Writes the index of dump_path to index_path (<dump_path>.olidx by default) and returns its row count
+    type_prefix -- only index rows whose type starts with this, e.g. '/type/edition'
+    Rows whose key is not an edition, work or author OLID are skipped; the first row wins for repeated keys.
+    """
+    index_path = index_path or dump_path + INDEX_SUFFIX
+    prefix = type_prefix.encode() if type_prefix else b''
+    compressed = is_gzip(dump_path)
+    if compressed and not has_seek_points():
+        raise ImportError('indexed_gzip is required to index gzip dumps; install it or index %s uncompressed'
+                          % dump_path)
+    keys, offsets, lengths = array('Q'), array('Q'), array('I')
+    offset = 0
+    with open_gzip(dump_path, spacing=INDEX_SEEK_POINT_SPACING) if compressed else open(dump_path, 'rb') as fin:
+        for line in fin:
+            if line.startswith(prefix):
+                try:
+                    keys.append(pack_olid(line.split(b'\t', 2)[1].decode()))
+                except (IndexError, ValueError):
+                    pass
+                else:
+                    offsets.append(offset)
+                    lengths.append(len(line))
+            offset += len(line)
+        if compressed:
+            fin.export_index(index_path + GZIP_INDEX_SUFFIX)
+
+    keys = np.frombuffer(keys, dtype='<u8') if keys else np.empty(0, dtype='<u8')
+    order = np.argsort(keys, kind='stable')
+    keys = keys[order]
+    first = np.ones(len(keys), dtype=bool)
+    first[1:] = keys[1:] != keys[:-1]
+    order = order[first]
+    with open(index_path + '.tmp', 'wb') as fout:
+        fout.write(HEADER.pack(MAGIC, len(order), os.path.getsize(dump_path), GZIP_FLAG if compressed else 0))
+        fout.write(keys[first].tobytes())
+        fout.write(np.frombuffer(offsets, dtype='<u8')[order].tobytes() if offsets else b'')
+        fout.write(np.frombuffer(lengths, dtype='<u4')[order].tobytes() if lengths else b'')
+    os.replace(index_path + '.tmp', index_path)
+    return len(order)
+
+
+class DumpIndex(object):
+    """
+    Random access to the rows of a dump through its index
+    Lookups are thread safe.
+    """
+
+    def __init__(self, dump_path: str, index_path: str = None):
+        index_path = index_path or dump_path + INDEX_SUFFIX
+        with open(index_path, 'rb') as fin:
+            self._index = mmap.mmap(fin.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, count, dump_size, flags = HEADER.unpack_from(self._index)
+        if magic != MAGIC:
+            raise ValueError('%s is not a dump index' % index_path)
+        if os.path.getsize(dump_path) != dump_size:
+            raise ValueError('%s was built for another version of %s' % (index_path, dump_path))
+        gzip_index_path = index_path + GZIP_INDEX_SUFFIX
+        if flags & GZIP_FLAG and not has_seek_points():
+            self._index.close()
+            raise ImportError('indexed_gzip is required for lookups in the gzip dump %s' % dump_path)
+        if flags & GZIP_FLAG and not os.path.exists(gzip_index_path):
+            self._index.close()
+            raise ValueError('%s is missing, rebuild the index of %s' % (gzip_index_path, dump_path))
+        self.keys = np.frombuffer(self._index, '<u8', count, HEADER.size)
+        self.offsets = np.frombuffer(self._index, '<u8', count, HEADER.size + 8 * count)
+        self.lengths = np.frombuffer(self._index, '<u4', count, HEADER.size + 16 * count)
+        self.lock = threading.Lock()
+        if flags & GZIP_FLAG:
+            self.dump = open_gzip(dump_path, gzip_index_path, spacing=INDEX_SEEK_POINT_SPACING)
+            self._dump = None
+        else:
+            self.dump = open(dump_path, 'rb')
+            self._dump = mmap.mmap(self.dump.fileno(), 0, access=mmap.ACCESS_READ) if dump_size else None
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def __contains__(self, olid: str) -> bool:
+        return self.locate(olid) is not None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def locate(self, olid: str):
+        """Returns (offset, length) of the row for olid in the uncompressed dump, or None"""
+        try:
+            key = pack_olid(olid)
+        except ValueError:
+            return None
+        i = int(np.searchsorted(self.keys, np.uint64(key)))
+        if i == len(self.keys) or self.keys[i] != key:
+            return None
+        return int(self.offsets[i]), int(self.lengths[i])
+
+    def get_line(self, olid: str) -> bytes:
+        """Returns the dump row for olid, or None"""
+        location = self.locate(olid)
+        if location is None:
+            return None
+        offset, length = location
+        if self._dump is not None:
+            return self._dump[offset:offset + length]
+        with self.lock:
+            self.dump.seek(offset)
+            return self.dump.read(length)
+
+    def get(self, olid: str, loads=None) -> DumpRow:
+        """Returns the DumpRow for olid, or None"""
+        line = self.get_line(olid)
+        return None if line is None else DumpRow(line, loads)
+
+    def close(self) -> None:
+        del self.keys, self.offsets, self.lengths  # release the buffers exported from the mmap before closing it
+        self._index.close()
+        if self._dump is not None:
+            self._dump.close()
+        self.dump.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('dump_path', help='Path to an Open Library dump, *.txt or *.txt.gz')
+    parser.add_argument('--index', help='Path of the index (default: <dump_path>%s)' % INDEX_SUFFIX)
+    parser.add_argument('--type-prefix', help='Only index rows of this type, e.g. /type/edition')
+    parser.add_argument('--lookup', nargs='+', metavar='OLID', help='Print the rows for these OLIDs')
+    _args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if _args.lookup:
+        with DumpIndex(_args.dump_path, _args.index) as index:
+            for _olid in _args.lookup:
+                _line = index.get_line(_olid)
+                print(_line.decode().rstrip('\n') if _line else '%s not found' % _olid)
+    else:
+        logger.info('Indexed %d rows' % build_index(_args.dump_path, _args.index, _args.type_prefix))
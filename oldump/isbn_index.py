@@ -0,0 +1,129 @@
+"""
+Sorted ISBN-13 -> edition and work index
+build_isbn_index() turns the output of ia-sync-bot/extract-isbn.py, TSV or binary, into a file of three parallel arrays sorted
+by ISBN, then edition: the ISBN-13 as a uint64 and the numbers of the edition and work OLIDs as uint32 (0 where there is no
+work), 16 bytes per ISBN. ISBNIndex memory maps it and looks up whole batches of ISBNs with one
+numpy.searchsorted call, so checking whether Open Library has an ISBN needs no request.
+
+Usage:
+    python -m oldump.isbn_index isbns.tsv isbns.idx
+"""
+import argparse
+import logging
+import mmap
+import os
+import struct
+
+from collections import namedtuple
+
+import numpy as np
+
+from oldump.batch_isbn import validate_isbns
+from oldump.isbn_records import RECORD, is_records_file, read_records, read_tsv
+
+MAGIC = b'OLISBN\x00\x01'
+HEADER = struct.Struct('<8sQ')  # magic, ISBN count
+
+# found is a bool array; edition and work hold the OLID numbers, 0 where not found (or for editions without a work)
+ISBNMatches = namedtuple('ISBNMatches', ['found', 'edition', 'work'])
+
+logger = logging.getLogger('oldump.isbn_index')
+
+
+def build_isbn_index(isbns_path: str, index_path: str) -> int:
+    """
+    Writes the index of isbns_path to index_path and returns its size
+    isbns_path -- extract-isbn output, as TSV (whose BAD-ISBN lines are skipped) or as an oldump.isbn_records file
+    """
+    if is_records_file(isbns_path):
+        records = read_records(isbns_path)[0]
+    else:
+        records = np.concatenate([batch for batch, _ in read_tsv(isbns_path)] or [np.empty(0, dtype=RECORD)])
+
+    order = np.lexsort((records['edition'], records['isbn13']))  # the same order whatever the input order
+    with open(index_path + '.tmp', 'wb') as fout:
+        fout.write(HEADER.pack(MAGIC, len(order)))
+        for field in ('isbn13', 'edition', 'work'):
+            fout.write(np.ascontiguousarray(records[field][order]).tobytes())
+    os.replace(index_path + '.tmp', index_path)
+    return len(order)
+
+
+def isbn13_keys(isbns) -> np.ndarray:
+    """Returns the ISBN-13s of isbns (ISBN-10 or 13 strings in any form, or ints) as uint64, 0 where invalid"""
+    isbns = list(isbns)
+    if all(isinstance(isbn, (int, np.integer)) for isbn in isbns):
+        return np.array(isbns, dtype='<u8')
+    isbns = [isbn if isinstance(isbn, str) else str(isbn) for isbn in isbns]
+    return np.array([int(isbn13) if isbn13 else 0 for isbn13 in validate_isbns(isbns).isbn13], dtype='<u8')
+
+
+class ISBNIndex(object):
+    """Lookups in an index written by build_isbn_index()"""
+
+    def __init__(self, index_path: str):
+        with open(index_path, 'rb') as fin:
+            self._mapping = mmap.mmap(fin.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, count = HEADER.unpack_from(self._mapping)
+        if magic != MAGIC:
+            raise ValueError('%s is not an ISBN index' % index_path)
+        self.isbn13s = np.frombuffer(self._mapping, '<u8', count, HEADER.size)
+        self.edition_ids = np.frombuffer(self._mapping, '<u4', count, HEADER.size + 8 * count)
+        self.work_ids = np.frombuffer(self._mapping, '<u4', count, HEADER.size + 12 * count)
+
+    def __len__(self) -> int:
+        return len(self.isbn13s)
+
+    def __contains__(self, isbn) -> bool:
+        return bool(self.lookup([isbn]).found[0])
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def lookup(self, isbns) -> ISBNMatches:
+        """
+        Looks up a batch of ISBNs at once; returns ISBNMatches of arrays parallel to isbns
+        Where an ISBN belongs to several editions, the match is the one with the lowest OLID.
+        """
+        keys = isbn13_keys(isbns)
+        positions = np.searchsorted(self.isbn13s, keys)
+        found = positions < len(self.isbn13s)
+        found[found] = self.isbn13s[positions[found]] == keys[found]
+        found &= keys != 0
+        edition, work = np.zeros(len(keys), dtype='<u4'), np.zeros(len(keys), dtype='<u4')
+        edition[found] = self.edition_ids[positions[found]]
+        work[found] = self.work_ids[positions[found]]
+        return ISBNMatches(found, edition, work)
+
+    def get(self, isbn):
+        """Returns (edition OLID, work OLID or None) of the edition with isbn and the lowest OLID, or None"""
+        matches = self.lookup([isbn])
+        if not matches.found[0]:
+            return None
+        work = int(matches.work[0])
+        return 'OL%dM' % matches.edition[0], 'OL%dW' % work if work else None
+
+    def editions(self, isbn) -> list:
+        """Returns the OLIDs of every edition with isbn"""
+        key = isbn13_keys([isbn])[0]
+        if not key:
+            return []
+        start, end = np.searchsorted(self.isbn13s, key, 'left'), np.searchsorted(self.isbn13s, key, 'right')
+        return ['OL%dM' % edition for edition in self.edition_ids[start:end]]
+
+    def close(self) -> None:
+        del self.isbn13s, self.edition_ids, self.work_ids
+        self._mapping.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('isbns_path', help='Output of ia-sync-bot/extract-isbn.py, TSV or binary')
+    parser.add_argument('index_path', help='Path of the index to write')
+    _args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    logger.info('Indexed %d ISBNs' % build_isbn_index(_args.isbns_path, _args.index_path))
@@ -0,0 +1,138 @@
+"""
+Binary ISBN records, the fixed width form of ia-sync-bot/extract-isbn.py output
+A file holds a HEADER followed by RECORD structs: the ISBN-13 as a uint64 and the numbers of the edition and work
+OLIDs as uint32, 0 for editions without a work. read_records() maps it with numpy.memmap, without parsing or
+copying. BAD-ISBN lines have no place in it and are kept in a TSV side file.
+
+Usage:
+    python -m oldump.isbn_records isbns.tsv isbns.bin [--bad-isbns=bad-isbns.tsv]
+    python -m oldump.isbn_records isbns.bin isbns.tsv
+"""
+import argparse
+import logging
+import struct
+
+import numpy as np
+
+MAGIC = b'OLISBNR\x01'
+HEADER = struct.Struct('<8sQQ')  # magic, record count, flags
+SORTED_FLAG = 1  # records are sorted by ISBN, edition and work, without repeats
+RECORD = np.dtype([('isbn13', '<u8'), ('edition', '<u4'), ('work', '<u4')])
+TSV_BATCH_BYTES = 64 * 1024 * 1024  # TSV read and parsed at a time
+
+logger = logging.getLogger('oldump.isbn_records')
+
+
+def parse_tsv(lines):
+    """Returns (records, BAD-ISBN lines) for lines of extract-isbn TSV"""
+    records, bad = [], []
+    for line in lines:
+        fields = line.rstrip('\n').split('\t')
+        if fields[0] == 'BAD-ISBN:':
+            bad.append(line)
+            continue
+        try:
+            records.append((int(fields[0]), int(fields[1][2:-1]), 0 if fields[2] == 'NONE' else int(fields[2][2:-1])))
+        except (IndexError, ValueError):
+            logger.warning('Skipping %r' % line)
+    return np.array(records, dtype=RECORD), bad
+
+
+def format_tsv(records) -> str:
+    return ''.join('%d\tOL%dM\t%s\n' % (isbn13, edition, 'OL%dW' % work if work else 'NONE')
+                   for isbn13, edition, work in records.tolist())
+
+
+def is_records_file(path: str) -> bool:
+    with open(path, 'rb') as fin:
+        return fin.read(len(MAGIC)) == MAGIC
+
+
+class RecordWriter(object):
+    """Writes records to path in batches; the header is completed on close"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.count = 0
+        self.fout = open(path, 'wb')
+        self.fout.write(HEADER.pack(MAGIC, 0, 0))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def write(self, records) -> None:
+        self.fout.write(np.ascontiguousarray(records, dtype=RECORD).tobytes())
+        self.count += len(records)
+
+    def close(self, flags: int = 0) -> None:
+        if not self.fout.closed:
+            self.fout.seek(0)
+            self.fout.write(HEADER.pack(MAGIC, self.count, flags))
+            self.fout.close()
+
+
+def read_records(path: str, mode: str = 'r'):
+    """Returns (records, flags) for the records file at path; records is a numpy.memmap of RECORD"""
+    with open(path, 'rb') as fin:
+        magic, count, flags = HEADER.unpack(fin.read(HEADER.size))
+    if magic != MAGIC:
+        raise ValueError('%s is not an ISBN records file' % path)
+    if not count:
+        return np.empty(0, dtype=RECORD), flags
+    return np.memmap(path, dtype=RECORD, mode=mode, offset=HEADER.size, shape=(count,)), flags
+
+
+def sort_records(path: str) -> int:
+    """Sorts the records file at path by ISBN, edition and work and drops repeats; returns the new count"""
+    records = np.unique(read_records(path)[0])  # a sorted copy; the map is released before path is rewritten
+    with RecordWriter(path) as writer:
+        writer.write(records)
+        writer.close(SORTED_FLAG)
+    return len(records)
+
+
+def read_tsv(tsv_path: str):
+    """Yields (records, BAD-ISBN lines) for consecutive batches of an extract-isbn TSV"""
+    with open(tsv_path) as fin:
+        for lines in iter(lambda: fin.readlines(TSV_BATCH_BYTES), []):
+            yield parse_tsv(lines)
+
+
+def tsv_to_records(tsv_path: str, records_path: str, bad_path: str = None) -> int:
+    """Converts extract-isbn TSV to a records file, writing its BAD-ISBN lines to bad_path if given"""
+    bad_file = open(bad_path, 'w') if bad_path else None
+    try:
+        with RecordWriter(records_path) as writer:
+            for records, bad in read_tsv(tsv_path):
+                writer.write(records)
+                if bad_file is not None:
+                    bad_file.writelines(bad)
+            return writer.count
+    finally:
+        if bad_file is not None:
+            bad_file.close()
+
+
+def records_to_tsv(records_path: str, tsv_path: str, batch_size: int = 1000000) -> int:
+    records, _ = read_records(records_path)
+    with open(tsv_path, 'w') as fout:
+        for start in range(0, len(records), batch_size):
+            fout.write(format_tsv(records[start:start + batch_size]))
+    return len(records)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('input', help='extract-isbn TSV, or a records file')
+    parser.add_argument('output', help='Path of the records file, or of the TSV')
+    parser.add_argument('--bad-isbns', help='Path the BAD-ISBN lines of a TSV input are written to')
+    _args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if is_records_file(_args.input):
+        logger.info('Wrote %d lines' % records_to_tsv(_args.input, _args.output))
+    else:
+        logger.info('Wrote %d records' % tsv_to_records(_args.input, _args.output, _args.bad_isbns))
@@ -0,0 +1,82 @@
+"""
+Crash safe journal of completed OLIDs
+A Journal is an append-only text file of OLIDs, one per line, flushed and fsynced every sync_every additions and on
+close. Opening it loads the OLIDs already there into a set of packed integers (see oldump.olid), so a rerun can
+skip finished records before making any request. A line torn by a crash is dropped on load; at most the last
+sync_every OLIDs are lost, and those records are simply done again. AppendLog holds the file handling for logs of
+other records, such as oldump.sync_cache.
+"""
+import os
+
+from oldump.olid import pack_olid
+
+SYNC_EVERY = 100  # lines appended between fsyncs
+
+
+class AppendLog(object):
+    """Append-only log of text lines; subclasses load each complete line already in the file with load_line()"""
+
+    def __init__(self, path: str, sync_every: int = SYNC_EVERY):
+        self.path = path
+        self.sync_every = sync_every
+        self.unsynced = 0
+        self._load()
+        self.fout = open(path, 'a')
+
+    def _load(self) -> None:
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'rb+') as fin:
+            end = 0
+            for line in fin:
+                if not line.endswith(b'\n'):
+                    break
+                if line.strip():
+                    self.load_line(line.decode().strip())
+                end += len(line)
+            fin.truncate(end)
+
+    def load_line(self, line: str) -> None:
+        raise NotImplementedError
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def write(self, line: str) -> None:
+        self.fout.write(line + '\n')
+        self.unsynced += 1
+        if self.unsynced >= self.sync_every:
+            self.sync()
+
+    def sync(self) -> None:
+        self.fout.flush()
+        os.fsync(self.fout.fileno())
+        self.unsynced = 0
+
+    def close(self) -> None:
+        if not self.fout.closed:
+            self.sync()
+            self.fout.close()
+
+
+class Journal(AppendLog):
+
+    def __init__(self, path: str, sync_every: int = SYNC_EVERY):
+        self.olids = set()
+        super().__init__(path, sync_every)
+
+    def load_line(self, line: str) -> None:
+        self.olids.add(pack_olid(line))
+
+    def __contains__(self, olid: str) -> bool:
+        return pack_olid(olid) in self.olids
+
+    def __len__(self) -> int:
+        return len(self.olids)
+
+    def add(self, olid: str) -> None:
+        self.olids.add(pack_olid(olid))
+        self.write(olid)
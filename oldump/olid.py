@@ -0,0 +1,20 @@
+"""
+Open Library ids packed into integers
+An OLID such as OL123M packs into (123 << 2) | 1, so sets and sorted arrays of OLIDs hold plain integers rather
+than strings. Editions, works and authors get distinct type codes and never collide.
+"""
+OLID_TYPES = {'M': 1, 'W': 2, 'A': 3}
+OLID_SUFFIXES = {code: suffix for suffix, code in OLID_TYPES.items()}
+
+
+def pack_olid(olid: str) -> int:
+    """Returns the integer for an OLID, e.g. 'OL123M' or '/books/OL123M'; raises ValueError if it is not one"""
+    olid = olid.rsplit('/', 1)[-1]
+    if not olid.startswith('OL') or olid[-1:] not in OLID_TYPES or not olid[2:-1].isdigit():
+        raise ValueError('Not an Open Library id: %r' % olid)
+    return int(olid[2:-1]) << 2 | OLID_TYPES[olid[-1]]
+
+
+def unpack_olid(packed: int) -> str:
+    """Returns the OLID for an integer from pack_olid()"""
+    return 'OL%d%s' % (packed >> 2, OLID_SUFFIXES[packed & 3])
@@ -0,0 +1,24 @@
+"""
+A request rate limit shared between threads
+"""
+import threading
+import time
+
+
+class RateLimiter(object):
+    """Spaces calls to wait() from any number of threads at least 1/rate seconds apart; rate None means no limit"""
+
+    def __init__(self, rate: float = None):
+        self.interval = 1.0 / rate if rate else 0.0
+        self.lock = threading.Lock()
+        self.next_time = 0.0
+
+    def wait(self) -> None:
+        if not self.interval:
+            return
+        with self.lock:
+            now = time.monotonic()
+            at = max(now, self.next_time)
+            self.next_time = at + self.interval
+        if at > now:
+            time.sleep(at - now)
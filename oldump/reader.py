@@ -0,0 +1,121 @@
+"""
+Streaming reader for Open Library dumps
+Every dump row holds five tab separated columns: type, key, revision, last_modified and the record JSON.
+Rows are yielded as DumpRow objects that only split the line and decode the JSON when those fields are used,
+so rows can be filtered on their raw bytes first. Plain, gzip and multi-member gzip dumps are read alike; gzip
+dumps are inflated by one of the oldump.decompress backends.
+"""
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+from oldump.decompress import open_gzip_stream
+
+HEADER = {'type': 0,
+          'key': 1,
+          'revision': 2,
+          'last_modified': 3,
+          'JSON': 4}
+GZIP_MAGIC = b'\x1f\x8b'
+
+
+def json_loads(backend: str = None):
+    """
+    Returns the loads function of a JSON backend
+    backend -- 'orjson', 'json' or None for orjson when it is installed and json otherwise
+    """
+    if backend is None:
+        backend = 'json' if orjson is None else 'orjson'
+    if backend == 'orjson':
+        if orjson is None:
+            raise ImportError('orjson is not installed')
+        return orjson.loads
+    elif backend == 'json':
+        return json.loads
+    raise ValueError('Unknown JSON backend: %s' % backend)
+
+
+class DumpRow(object):
+    """A single dump row, decoded lazily"""
+
+    __slots__ = ('line', 'loads', '_fields', '_json')
+
+    def __init__(self, line: bytes, loads=None):
+        self.line = line
+        self.loads = loads or json_loads()
+        self._fields = None
+        self._json = None
+
+    def __repr__(self):
+        return '<DumpRow %s>' % self.line[:80]
+
+    @property
+    def fields(self) -> list:
+        if self._fields is None:
+            self._fields = self.line.split(b'\t', HEADER['JSON'])
+        return self._fields
+
+    @property
+    def type(self) -> str:
+        return self.fields[HEADER['type']].decode()
+
+    @property
+    def key(self) -> str:
+        return self.fields[HEADER['key']].decode()
+
+    @property
+    def olid(self) -> str:
+        return self.key.split('/')[-1]
+
+    @property
+    def revision(self) -> int:
+        return int(self.fields[HEADER['revision']])
+
+    @property
+    def last_modified(self) -> str:
+        return self.fields[HEADER['last_modified']].decode()
+
+    @property
+    def json(self) -> dict:
+        if self._json is None:
+            self._json = self.loads(self.fields[HEADER['JSON']])
+        return self._json
+
+
+def is_gzip(path: str) -> bool:
+    with open(path, 'rb') as fin:
+        return fin.read(len(GZIP_MAGIC)) == GZIP_MAGIC
+
+
+def open_dump(path: str, decompress: str = 'auto'):
+    """
+    Opens a plain or gzip compressed dump for binary reading
+    decompress -- the oldump.decompress backend used for gzip dumps
+    """
+    if is_gzip(path):
+        return open_gzip_stream(path, decompress)
+    return open(path, 'rb')
+
+
+def read_dump(dump, type_prefix: str = None, json_backend: str = None, decompress: str = 'auto'):
+    """
+    Yields a DumpRow for every row of a dump
+
+    dump -- path of a plain or gzip dump, or a dump opened for binary reading
+    type_prefix -- only yield rows whose type starts with this, e.g. '/type/edition'; checked before decoding
+    json_backend -- see json_loads()
+    decompress -- see open_dump()
+    """
+    loads = json_loads(json_backend)
+    prefix = type_prefix.encode() if type_prefix else b''
+    fin = open_dump(dump, decompress) if isinstance(dump, str) else dump
+    try:
+        for line in fin:
+            if line.startswith(prefix):
+                yield DumpRow(line, loads)
+    finally:
+        if isinstance(dump, str):
+            fin.close()
@@ -0,0 +1,46 @@
+"""
+Compare dump records with the live records on Open Library
+A dump row already carries the record's revision and JSON. When the live record is still at that revision the
+dump JSON can be used as is, so only records that changed since the dump need to be downloaded.
+"""
+import json
+import logging
+
+logger = logging.getLogger('oldump.revisions')
+
+
+def get_revisions(ol, keys: list) -> dict:
+    """
+    Returns {key: revision} of the live records for keys, fetched with a single query
+    Keys missing from the response are left out; if the query fails the result is empty, so that
+    callers fall back to fetching every record.
+    """
+    if not keys:
+        return dict()
+    query = {'key': list(keys), 'revision': None, 'limit': len(keys)}
+    try:
+        response = ol.session.get(ol.base_url + '/query.json', params={'query': json.dumps(query)})
+        response.raise_for_status()
+        return {doc['key']: doc['revision'] for doc in response.json() if doc.get('revision') is not None}
+    except Exception as e:
+        logger.warning('Revision query for %d keys failed: %s' % (len(keys), e))
+        return dict()
+
+
+def unchanged_keys(ol, dump_revisions: dict) -> set:
+    """Returns the keys of dump_revisions ({key: revision in the dump}) whose live record has the same revision"""
+    live_revisions = get_revisions(ol, list(dump_revisions))
+    return {key for key, revision in dump_revisions.items() if live_revisions.get(key) == int(revision)}
+
+
+def edition_from_json(ol, data: dict):
+    """
+    Returns an olclient Edition built from edition JSON, as ol.Edition.get would from the live record
+    Authors are referenced by key instead of being fetched, which is all Edition.save needs.
+    """
+    data = dict(data)
+    authors = [ol.Author(author['key'].split('/')[-1], None) for author in data.pop('authors', [])]
+    data['title'] = data.get('title', None)
+    book_args = ol.Edition._ol_edition_json_to_book_args(data)
+    book_args['authors'] = authors
+    return ol.Edition(**book_args)
@@ -0,0 +1,66 @@
+"""
+External merge of sorted runs of text lines, like `sort -u`
+Runs are spilled to temporary files as they come, so memory holds one run at a time. At most fan_in files are open
+at once: whenever fan_in runs of a generation pile up they are merged into one run of the next generation, so every
+line is copied once per generation, log(runs) / log(fan_in) times in all.
+"""
+import heapq
+import os
+import tempfile
+
+from itertools import count
+
+MERGE_FAN_IN = 128  # runs open at once, well under the usual limit of 1024 open files
+
+
+def merge_unique(paths, fout) -> None:
+    """Writes the lines of the sorted files at paths to fout in order, without repeats"""
+    files = []
+    try:
+        for path in paths:
+            files.append(open(path))
+        previous = None
+        for line in heapq.merge(*files):
+            if line != previous:
+                fout.write(line)
+                previous = line
+    finally:
+        for run_file in files:
+            run_file.close()
+
+
+def merge_runs(runs, fout, fan_in: int = MERGE_FAN_IN) -> None:
+    """Writes the lines of runs (sorted iterables of lines) to fout in order, without repeats"""
+    if fan_in < 2:
+        raise ValueError('fan_in must be at least 2')
+    with tempfile.TemporaryDirectory() as tmp:
+        names = count()
+        generations = []  # paths of the runs waiting to be merged, by generation
+
+        def merge(paths) -> str:
+            path = os.path.join(tmp, '%d.tsv' % next(names))
+            with open(path, 'w') as run_file:
+                merge_unique(paths, run_file)
+            for merged in paths:
+                os.remove(merged)
+            return path
+
+        for run in runs:
+            path = os.path.join(tmp, '%d.tsv' % next(names))
+            with open(path, 'w') as run_file:
+                run_file.writelines(run)
+            generation = 0
+            while True:
+                if generation == len(generations):
+                    generations.append([])
+                generations[generation].append(path)
+                if len(generations[generation]) < fan_in:
+                    break
+                path = merge(generations[generation])
+                generations[generation] = []
+                generation += 1
+
+        left = [path for paths in generations for path in paths]
+        while len(left) > fan_in:
+            left = left[fan_in:] + [merge(left[:fan_in])]
+        merge_unique(left, fout)
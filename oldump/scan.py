@@ -0,0 +1,116 @@
+"""
+Parallel scans of dumps
+scan_chunks() memory maps an uncompressed dump, cuts it into newline aligned chunks and has a process pool call a
+function on each. Every worker maps the file itself and slices its chunk out of the mapping, so only chunk offsets
+and results travel between processes. Gzip dumps cannot be mapped: scan_dump() inflates them in this process and
+sends the chunks to the pool instead. Either way results come back in dump order, with at most two chunks per
+worker in flight.
+"""
+import io
+import mmap
+import multiprocessing
+import os
+
+from collections import deque
+
+from oldump.reader import DumpRow, is_gzip, json_loads, open_dump
+
+CHUNK_SIZE = 16 * 1024 * 1024  # bytes of dump per chunk
+
+_mapping = None  # the dump, mapped once per worker process
+
+
+def chunk_offsets(mapping, chunk_size: int = CHUNK_SIZE):
+    """Yields (start, end) of consecutive chunks of mapping of about chunk_size bytes, each ending after a newline"""
+    start, size = 0, len(mapping)
+    while start < size:
+        end = mapping.find(b'\n', min(start + chunk_size, size) - 1)
+        end = size if end == -1 else end + 1
+        yield start, end
+        start = end
+
+
+def stream_chunks(fin, chunk_size: int = CHUNK_SIZE):
+    """Yields consecutive chunks of about chunk_size bytes read from fin, each ending after a newline"""
+    for chunk in iter(lambda: fin.read(chunk_size), b''):
+        yield chunk + fin.readline()
+
+
+def iter_rows(chunk: bytes, type_prefix: str = None, json_backend: str = None):
+    """Yields a DumpRow for every row of a chunk, like oldump.reader.read_dump"""
+    loads = json_loads(json_backend)
+    prefix = type_prefix.encode() if type_prefix else b''
+    for line in io.BytesIO(chunk):
+        if line.startswith(prefix):
+            yield DumpRow(line, loads)
+
+
+def _map(path: str):
+    with open(path, 'rb') as fin:
+        return mmap.mmap(fin.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def _init_worker(path: str) -> None:
+    global _mapping
+    _mapping = _map(path)
+
+
+def _scan_chunk(scan_fn, start: int, end: int):
+    return scan_fn(_mapping[start:end])
+
+
+def scan_chunks(path: str, scan_fn, workers: int = None, chunk_size: int = CHUNK_SIZE):
+    """
+    Yields scan_fn(chunk) for the newline aligned chunks of the uncompressed dump at path, in order
+
+    scan_fn -- called with the bytes of a chunk, e.g. to loop over iter_rows(chunk); must be picklable, i.e.
+               defined at the top level of a module
+    workers -- processes to scan with, os.cpu_count() by default; 1 scans in this process
+    """
+    workers = workers or os.cpu_count()
+    if not os.path.getsize(path):
+        return
+    mapping = _map(path)
+    try:
+        if workers <= 1:
+            for start, end in chunk_offsets(mapping, chunk_size):
+                yield scan_fn(mapping[start:end])
+            return
+
+        with multiprocessing.Pool(workers, initializer=_init_worker, initargs=(path,)) as pool:
+            yield from _in_order(pool, workers, ((_scan_chunk, (scan_fn, start, end))
+                                                 for start, end in chunk_offsets(mapping, chunk_size)))
+    finally:
+        mapping.close()
+
+
+def scan_dump(path: str, scan_fn, workers: int = None, chunk_size: int = CHUNK_SIZE, decompress: str = 'auto'):
+    """
+    Yields scan_fn(chunk) for the newline aligned chunks of the plain or gzip dump at path, in order
+    Plain dumps are scanned with scan_chunks(); see there for scan_fn and workers.
+    decompress -- the oldump.decompress backend used for gzip dumps
+    """
+    if not is_gzip(path):
+        yield from scan_chunks(path, scan_fn, workers, chunk_size)
+        return
+
+    workers = workers or os.cpu_count()
+    with open_dump(path, decompress) as fin:
+        if workers <= 1:
+            for chunk in stream_chunks(fin, chunk_size):
+                yield scan_fn(chunk)
+            return
+
+        with multiprocessing.Pool(workers) as pool:
+            yield from _in_order(pool, workers, ((scan_fn, (chunk,)) for chunk in stream_chunks(fin, chunk_size)))
+
+
+def _in_order(pool, workers: int, calls):
+    """Yields the results of calls ((fn, args) pairs) run on pool, in order, keeping 2 * workers in flight"""
+    pending = deque()
+    for fn, args in calls:
+        pending.append(pool.apply_async(fn, args))
+        if len(pending) >= 2 * workers:
+            yield pending.popleft().get()
+    while pending:
+        yield pending.popleft().get()
@@ -0,0 +1,55 @@
+"""
+Persistent cache of the outcome of syncing an edition at a given revision
+An oldump.journal.AppendLog of OLID, revision and outcome lines, loaded into a dict of packed OLIDs (see
+oldump.olid) when it is opened. An edition synced successfully, or found to have nothing to sync, need not be
+synced again until its revision changes.
+"""
+import threading
+
+from oldump.journal import SYNC_EVERY, AppendLog
+from oldump.olid import pack_olid
+
+SYNCED = 'synced'
+NO_CHANGES = 'no-op'
+FAILED = 'failed'
+DONE = (SYNCED, NO_CHANGES)  # outcomes that make another sync at the same revision pointless
+
+
+class SyncCache(AppendLog):
+    """Thread safe; hits and misses count is_done() lookups"""
+
+    def __init__(self, path: str, sync_every: int = SYNC_EVERY):
+        self.outcomes = dict()  # {packed OLID: (revision, outcome)}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        super().__init__(path, sync_every)
+
+    def load_line(self, line: str) -> None:
+        olid, revision, outcome = line.split()
+        self.outcomes[pack_olid(olid)] = (int(revision), outcome)
+
+    def __len__(self) -> int:
+        return len(self.outcomes)
+
+    def is_done(self, olid: str, revision: int) -> bool:
+        """Returns whether olid was synced, or had nothing to sync, at revision"""
+        with self.lock:
+            done = revision is not None and self.outcomes.get(pack_olid(olid), (None, None)) in (
+                (revision, outcome) for outcome in DONE)
+            if done:
+                self.hits += 1
+            else:
+                self.misses += 1
+            return done
+
+    def record(self, olid: str, revision: int, outcome: str) -> None:
+        if revision is None:
+            return
+        with self.lock:
+            self.outcomes[pack_olid(olid)] = (revision, outcome)
+            self.write('%s\t%d\t%s' % (olid, revision, outcome))
+
+    def close(self) -> None:
+        with self.lock:
+            super().close()
@@ -14,6 +14,10 @@ Usage:
     >>> p.media_file_link
     >>> p.publication_country
     >>> p.publication_city
+
+    Feeds too large to load at once are streamed a product at a time:
+    >>> for p in OnixFeedParser('onix_test_data.xml', stream=True).products:
+    ...     p.get_json
 """
 
 import sys
@@ -30,6 +34,23 @@ import olclient.common as common
 
 ol = OpenLibrary()
 
+# Compiled once and evaluated relative to each Product element, so a product only
+# ever reads its own fields and parsing a feed stays linear in its size
+TITLE_TEXT = etree.XPath('Title[1]/TitleText[1]')
+PUBLISHER_NAME = etree.XPath('Publisher[1]/PublisherName[1]')
+AUTHORS = etree.XPath('Author')
+LANGUAGE_CODE = etree.XPath('Language[1]/LanguageCode[1]')
+PRODUCT_IDENTIFIERS = etree.XPath('ProductIdentifier')
+MEDIA_FILE_LINK = etree.XPath('MediaFile[1]/MediaFileLink[1]')
+COUNTRY_OF_PUBLICATION = etree.XPath('CountryOfPublication[1]')
+CITY_OF_PUBLICATION = etree.XPath('CityOfPublication[1]')
+
+
+def first_text(xpath, element):
+    """Returns the text of the first element xpath finds under element, or empty string"""
+    found = xpath(element)
+    return found[0].text if found else ''
+
 class TestOnixParser(unittest.TestCase):
 
     # TEST_ONIX_FEED_URL = 'https://storage.googleapis.com/support-kms-prod/SNP_EFDA74818D56F47DE13B6FF3520E468126FD_3285388_en_v2'
@@ -124,12 +145,41 @@ class TestOnixProductBot(unittest.TestCase):
 
 
 class OnixFeedParser(object):
+    """Parses the products of an ONIX feed
 
-    def __init__(self, filename, ns=""):
-        parser = etree.XMLParser(ns_clean=True)
-        self.onix = etree.parse(filename, parser).getroot()
+    Args:
+        filename: Path or file object of the feed
+        ns: Namespace of the feed
+        stream: Whether products is a generator over the feed, so feeds too large to load fit in memory
+
+    Usage:
+        >>> from onixparser import OnixFeedParser
+        >>> for p in OnixFeedParser('onix_test_data.xml', stream=True).products:
+        ...     p.get_json
+    """
+
+    def __init__(self, filename, ns="", stream=False):
         self.ns = ns
-        self.products = [OnixProductParser(product, ns) for product in self.onix.findall('Product')]
+        if stream:
+            self.onix = None
+            self.products = self.iter_products(filename, ns)
+        else:
+            parser = etree.XMLParser(ns_clean=True)
+            self.onix = etree.parse(filename, parser).getroot()
+            self.products = [OnixProductParser(product, ns) for product in self.onix.findall('Product')]
+
+    @staticmethod
+    def iter_products(filename, ns=""):
+        """Yields an OnixProductParser for each product of the feed as soon as it is parsed
+
+        Each product is cleared, along with the elements before it, once the next one is asked for,
+        so memory stays flat however large the feed is. Read a product before moving on to the next.
+        """
+        for _, product in etree.iterparse(filename, events=('end',), tag='Product', huge_tree=True):
+            yield OnixProductParser(product, ns)
+            product.clear()
+            while product.getprevious() is not None:
+                del product.getparent()[0]
 
 
 class OnixProductParser(object):
@@ -154,10 +204,7 @@ class OnixProductParser(object):
             >>> p = op.products[0]
             >>> p.title
         """
-        title = self.product.xpath('//Title')
-        if title:
-            title = title[0].xpath('//TitleText')
-        return title[0].text if title else ''
+        return first_text(TITLE_TEXT, self.product)
 
     @property
     def publisher(self):
@@ -175,10 +222,7 @@ class OnixProductParser(object):
             >>> p = op.products[0]
             >>> p.publisher
         """
-        publisher = self.product.xpath('//Publisher')
-        if publisher:
-            publisher = publisher[0].xpath('//PublisherName')
-        return publisher[0].text if publisher else ''
+        return first_text(PUBLISHER_NAME, self.product)
 
     @property
     def authors(self):
@@ -196,7 +240,7 @@ class OnixProductParser(object):
             >>> p = op.products[0]
             >>> p.authors
         """
-        authors = self.product.xpath('//Author')
+        authors = AUTHORS(self.product)
         
         book_authors = []
 
@@ -222,12 +266,7 @@ class OnixProductParser(object):
             >>> p = op.products[0]
             >>> p.languages
         """
-        languages = self.product.xpath('//Language')
-        
-        if languages:
-            languages = languages[0].xpath('//LanguageCode')
-            
-        return languages[0].text if languages else ''
+        return first_text(LANGUAGE_CODE, self.product)
 
     @property
     def identifiers(self):
@@ -248,7 +287,7 @@ class OnixProductParser(object):
             >>> p.identifiers
         """
 
-        identifiers = self.product.xpath('//ProductIdentifier')
+        identifiers = PRODUCT_IDENTIFIERS(self.product)
 
         if identifiers:
             IDENTIFIER_TYPES = {'02': 'isbn10', '15': 'isbn13'}
@@ -276,10 +315,7 @@ class OnixProductParser(object):
             >>> p = op.products[0]
             >>> p.media_file_link
         """
-        bookcover = self.product.xpath('//MediaFile')
-        if bookcover:
-            bookcover = bookcover[0].xpath('//MediaFileLink')
-        return bookcover[0].text if bookcover else ''
+        return first_text(MEDIA_FILE_LINK, self.product)
 
     @property
     def publication_country(self):
@@ -300,11 +336,7 @@ class OnixProductParser(object):
             >>> p = op.products[0]
             >>> p.publication_country
         """
-        publication_country = self.product.xpath('//CountryOfPublication')
-        if publication_country:
-            return publication_country[0].text
-        else:
-            return ''
+        return first_text(COUNTRY_OF_PUBLICATION, self.product)
 
     @property
     def publication_city(self):
@@ -322,11 +354,7 @@ class OnixProductParser(object):
             >>> p = op.products[0]
             >>> p.publication_city
         """
-        publication_city = self.product.xpath('//CityOfPublication')
-        if publication_city:
-            return publication_city[0].text
-        else:
-            return ''
+        return first_text(CITY_OF_PUBLICATION, self.product)
 
     @property
     def get_json(self):
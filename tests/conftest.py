@@ -0,0 +1,5 @@
+import os
+import sys
+
+# the test directories are not packages, so make tests/helpers.py importable from all of them
+sys.path.insert(0, os.path.dirname(__file__))
@@ -0,0 +1,62 @@
+import threading
+
+import requests
+
+from coverbot.cover_updater import CoverUpdater, dump_editions
+
+
+class FakeOpenLibrary:
+    def __init__(self, status_codes):
+        self.status_codes = status_codes  # by OLID; editions without one already have a cover
+        self.uploads = []
+        self.lock = threading.Lock()
+        ol = self
+
+        class Edition:
+            def __init__(self, olid):
+                self.olid = olid
+                self.covers = [] if olid in ol.status_codes else [1]
+
+            @classmethod
+            def get(cls, olid):
+                if olid == 'OL13M':
+                    raise requests.ConnectionError('connection reset')
+                return cls(olid)
+
+            def add_bookcover(self, url):
+                with ol.lock:
+                    ol.uploads.append((self.olid, url))
+                response = requests.models.Response()
+                response.status_code = ol.status_codes[self.olid]
+                return response
+
+        self.Edition = Edition
+
+
+def test_cover_updater():
+    status_codes = {'OL%dM' % i: 500 if i == 7 else 200 for i in range(20) if i % 4}
+    ol = FakeOpenLibrary(status_codes)
+    editions = iter([('/books/OL%dM' % i, 1, 'ocaid%d' % i, None) for i in range(20)])
+    fixed = []
+
+    updater = CoverUpdater(ol, workers=4, rate=1000)
+    updater.run(editions, fixed.append)
+    # only editions whose upload succeeded are reported, failures are counted but do not stop the run
+    assert sorted(fixed) == sorted(olid for olid, code in status_codes.items() if code == 200 and olid != 'OL13M')
+    assert (updater.fixed, updater.skipped, updater.failed) == (13, 5, 2)
+    assert ('OL1M', 'https://archive.org/download/ocaid1/page/cover') in ol.uploads
+    assert len(ol.uploads) == 14
+
+
+def test_dump_editions(tmp_path):
+    rows = ['/type/edition\t/books/OL1M\t2\t2020-01-01\t{"key": "/books/OL1M", "ocaid": "roman00"}',
+            '/type/edition\t/books/OL2M\t1\t2020-01-01\t{"key": "/books/OL2M", "ocaid": "greek00", "covers": [1]}',
+            '/type/edition\t/books/OL3M\t1\t2020-01-01\t{"key": "/books/OL3M"}',
+            '/type/edition\t/books/OL4M\t1\t2020-01-01\t{"key": "/books/OL4M", "ocaid": ""}',
+            '/type/work\t/works/OL1W\t1\t2020-01-01\t{"key": "/works/OL1W", "ocaid": "roman00"}',
+            '/type/edition\t/books/OL5M\t3\t2020-01-01\t{"key": "/books/OL5M", "ocaid": "latin00", "covers": []}',
+            '/type/edition\t/books/OL6M\t1\t2020-01-01\t{"ocaid": "hebrew00", "key": "/books/OL6M"}']
+    path = tmp_path / 'dump.txt'
+    path.write_text('\n'.join(rows) + '\n')
+    assert [edition[:3] for edition in dump_editions(str(path))] == [('/books/OL1M', 2, 'roman00'),
+                                                                      ('/books/OL6M', 1, 'hebrew00')]
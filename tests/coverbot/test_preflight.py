@@ -0,0 +1,124 @@
+import threading
+
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from coverbot.preflight import CoverPreflight
+
+
+class CoverHandler(BaseHTTPRequestHandler):
+    """Stands in for archive.org: /download/<ocaid>/page/cover redirects to the image like the real one"""
+    requests = Counter()
+
+    def log_message(self, *args):
+        pass
+
+    def respond(self, status, content_type='image/jpeg', location=None):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', '0')
+        if location:
+            self.send_header('Location', location)
+        self.end_headers()
+
+    def do_HEAD(self):
+        ocaid = self.path.split('/')[2]
+        self.requests[ocaid] += 1
+        if self.path.startswith('/img/'):
+            self.respond(200)
+        elif ocaid.startswith('good'):
+            self.respond(302, location='/img/covers/%s.jpg' % ocaid)
+        elif ocaid.startswith('html'):
+            self.respond(200, 'text/html')
+        elif ocaid.startswith('nohead'):
+            self.respond(405, 'text/plain')
+        else:
+            self.respond(404, 'text/html')
+
+    def do_GET(self):
+        ocaid = self.path.split('/')[2]
+        self.requests[ocaid] += 1
+        assert self.headers['Range'] == 'bytes=0-0'
+        self.respond(206)
+
+
+@pytest.fixture
+def server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), CoverHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    CoverHandler.requests.clear()
+    yield 'http://127.0.0.1:%d/download/%%s/page/cover' % server.server_port
+    server.shutdown()
+    server.server_close()
+
+
+def test_preflight(server):
+    preflight = CoverPreflight(server, concurrency=4)
+    ocaids = ['good1', 'missing1', 'html1', 'nohead1', 'good2', 'good1', 'missing1']
+    editions = [('/books/OL%dM' % i, 1, ocaid, None) for i, ocaid in enumerate(ocaids)]
+    passed = list(preflight.filter(iter(editions), lookahead=3))
+    assert [edition[2] for edition in passed] == ['good1', 'nohead1', 'good2', 'good1']
+    assert (preflight.passed, preflight.rejected, preflight.errors) == (4, 3, 0)
+    # cached by ocaid: the repeated ocaids made no requests
+    assert CoverHandler.requests['missing1'] == 1
+    assert CoverHandler.requests['good1'] == 1  # the redirect target is counted under 'covers'
+    assert preflight.cache == {'good1': True, 'missing1': False, 'html1': False, 'nohead1': True, 'good2': True}
+
+
+def test_preflight_cache_is_bounded(server):
+    preflight = CoverPreflight(server, concurrency=1, cache_size=2)
+    ocaids = ['good1', 'good2', 'good1', 'good3', 'good2']
+    editions = [('/books/OL%dM' % i, 1, ocaid, None) for i, ocaid in enumerate(ocaids)]
+    assert len(list(preflight.filter(iter(editions)))) == 5
+    # good2 was the least recently used when good3 was added, so it was checked again
+    assert (CoverHandler.requests['good1'], CoverHandler.requests['good2'], CoverHandler.requests['good3']) == (1, 2, 1)
+    assert list(preflight.cache) == ['good3', 'good2']
+
+
+def test_preflight_connection_errors_are_not_cached():
+    preflight = CoverPreflight('http://127.0.0.1:1/download/%s/page/cover', timeout=1)
+    assert list(preflight.filter([('/books/OL1M', 1, 'good1', None), ('/books/OL2M', 1, 'good2', None)])) == []
+    # failed checks count as errors, not as missing covers
+    assert (preflight.passed, preflight.rejected, preflight.errors) == (0, 0, 2)
+    assert preflight.cache == {}
+
+
+def test_preflight_overlaps_checks_with_the_consumer():
+    consumed = threading.Event()
+
+    class Preflight(CoverPreflight):
+        def is_image(self, ocaid):
+            # a later cover check only finishes once the first edition reached the consumer
+            return ocaid != 'ocaid5' or consumed.wait(5)
+
+    preflight = Preflight('%s', concurrency=4)
+    editions = iter([('/books/OL%dM' % i, 1, 'ocaid%d' % i, None) for i in range(10)])
+    passed = preflight.filter(editions, lookahead=8)
+    assert next(passed)[2] == 'ocaid0'
+    consumed.set()
+    assert [edition[2] for edition in passed] == ['ocaid%d' % i for i in range(1, 10)]
+    assert preflight.passed == 10
+
+
+def test_preflight_early_close_and_source_errors():
+    class Preflight(CoverPreflight):
+        def is_image(self, ocaid):
+            return True
+
+    preflight = Preflight('%s')
+    passed = preflight.filter(iter([('/books/OL%dM' % i, 1, 'ocaid%d' % i, None) for i in range(100)]),
+                              lookahead=2)
+    assert next(passed)[2] == 'ocaid0'
+    passed.close()  # the read-ahead thread is stopped while blocked on a full queue
+
+    def broken():
+        yield '/books/OL1M', 1, 'ocaid1', None
+        raise IOError('truncated dump')
+
+    passed = preflight.filter(broken())
+    assert next(passed)[2] == 'ocaid1'
+    with pytest.raises(IOError):
+        next(passed)
@@ -0,0 +1,33 @@
+"""Dump rows and ISBN inputs shared by the tests of the bots and of oldump"""
+import json
+import random
+
+
+def dump_row(key, revision=1, _type='/type/edition', **fields) -> bytes:
+    """Returns a dump line of a record with the given fields; an edition OLID stands for its /books/ key"""
+    if not key.startswith('/'):
+        key = '/books/%s' % key
+    _json = dict(key=key, type={'key': _type}, revision=revision, **fields)
+    return '\t'.join([_type, key, str(revision), '2020-01-01T00:00:00', json.dumps(_json)]).encode() + b'\n'
+
+
+def differential_corpus(count=50000, seed=0):
+    """ISBN-like strings covering the branches of isbnlib's canonical() and get_canonical_isbn()"""
+    rng = random.Random(seed)
+    corpus = ["", "0", "0000000000", "000000000X", "0000000000000", "0123456789", "0425016013", "0-425-01601-3",
+              "978-0-425-01601-5", "9780425016015", "978042501601-5", "978--0425016015", "044178838x", "044178838X",
+              "1234567890123", "123456789X", "12345678X9", " 0425016013", "0425016013 ", "ISBN 13: 9780425016015",
+              "(ebook)0441788386", "0-441-78838-6x", "----------0425016013", "0425016013-9780425016015"]
+    for _ in range(count):
+        kind = rng.random()
+        if kind < 0.5:
+            alphabet, length = '0123456789Xx-', rng.randint(8, 24)
+        elif kind < 0.8:
+            alphabet, length = '0123456789-', rng.randint(8, 20)
+        else:
+            alphabet, length = '0123456789Xx- ISBN:()', rng.randint(0, 40)
+        isbn = ''.join(rng.choice(alphabet) for _ in range(length))
+        if rng.random() < 0.3:
+            isbn = '97' + rng.choice('789') + isbn
+        corpus.append(isbn)
+    return corpus
@@ -0,0 +1,43 @@
+import importlib.util
+import json
+import os
+
+from helpers import dump_row
+from oldump.olid import pack_olid
+
+SCRIPT_PATH = os.path.join(os.path.dirname(__file__), '..', '..', 'ia-sync-bot', 'legacy-openlibrary-id-check.py')
+spec = importlib.util.spec_from_file_location('legacy_openlibrary_id_check', SCRIPT_PATH)
+legacy_check = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(legacy_check)
+
+
+def test_join(tmp_path):
+    results_path = str(tmp_path / 'results.txt')
+    with open(results_path, 'w') as fout:
+        for olid in ('OL12M', 'OL3M', 'OL4M', 'OL9M'):  # OL9M is not in the dump
+            fout.write(json.dumps({'identifier': 'ia_%s' % olid, 'openlibrary': olid}) + '\n')
+        fout.write(json.dumps({'identifier': 'ia_none', 'openlibrary': 'not an OLID'}) + '\n')
+    dump_path = str(tmp_path / 'dump.txt')
+    with open(dump_path, 'wb') as fout:
+        fout.write(dump_row('OL112M', title='not OL12M'))  # neither its key nor the substring match counts
+        fout.write(dump_row('OL12M', works=[{'key': '/works/OL1W'}]))
+        fout.write(dump_row('OL3M', ocaid='ia_OL3M'))
+        fout.write(dump_row('OL4M', works=[{'key': '/works/OL2W'}], ocaid='ia_OL4M'))
+        fout.write(dump_row('OL5M', notes='see OL4M'))  # mentions a legacy OLID, but is not one
+        fout.write(dump_row('/works/OL12W', _type='/type/work'))
+
+    legacy = legacy_check.legacy_olids(results_path)
+    assert legacy == {pack_olid(olid) for olid in ('OL12M', 'OL3M', 'OL4M', 'OL9M')}
+    linked, orphans, no_ocaid = legacy_check.join_dump(dump_path, legacy)
+    assert linked == 3
+    assert orphans == {pack_olid('OL3M')}
+    assert no_ocaid == {pack_olid('OL12M')}
+
+    update_path = str(tmp_path / 'olids-to-update.txt')
+    legacy_check.write_olids_to_update(results_path, no_ocaid, update_path)
+    with open(update_path) as fin:
+        assert [json.loads(line)['openlibrary'] for line in fin] == ['OL12M']
+    list_path = str(tmp_path / 'orphan.lst')
+    legacy_check.write_list(list_path, orphans)
+    with open(list_path) as fin:
+        assert fin.read() == 'OL3M\n'
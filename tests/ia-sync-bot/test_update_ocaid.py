@@ -0,0 +1,148 @@
+import importlib.util
+import io
+import json
+import os
+
+import requests
+
+from oldump.journal import Journal
+from oldump.reader import DumpRow
+from oldump.sync_cache import SyncCache
+
+SCRIPT_PATH = os.path.join(os.path.dirname(__file__), '..', '..', 'ia-sync-bot', 'update-ocaid.py')
+spec = importlib.util.spec_from_file_location('update_ocaid', SCRIPT_PATH)
+update_ocaid = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(update_ocaid)
+
+
+def _response(status, body=None):
+    response = requests.models.Response()
+    response.status_code = status
+    response._content = json.dumps(body if body is not None else {}).encode()
+    return response
+
+
+class FakeOpenLibrary(object):
+    """Stands in for olclient: editions are saved with PUTs and synced through /admin/sync"""
+    base_url = 'http://localhost'
+
+    def __init__(self, editions, sync_statuses=None):
+        self.editions = editions  # {olid: edition fields}
+        self.sync_statuses = sync_statuses or {}  # {olid: [status of each sync]}
+        self.calls = []
+        ol = self
+
+        class Session(object):
+            def get(self, url, params=None):
+                if url.endswith('/query.json'):
+                    keys = json.loads(params['query'])['key']
+                    ol.calls.append(('query', len(keys)))
+                    return _response(200, [{'key': key, 'revision': ol.editions[key.split('/')[-1]]['revision']}
+                                           for key in keys])
+                olid = url.split('=')[-1]
+                ol.calls.append(('sync', olid))
+                status = ol.sync_statuses[olid].pop(0) if ol.sync_statuses.get(olid) else 200
+                return _response(status, {'error': 'no changes to _meta.xml'} if status == 200 else None)
+
+        self.session = Session()
+
+    def get(self, olid):
+        self.calls.append(('get', olid))
+        return FakeEdition(self, olid, **self.editions[olid])
+
+
+class FakeEdition(object):
+    def __init__(self, ol, olid, **fields):
+        self.ol = ol
+        self.olid = olid
+        self.__dict__.update(fields)
+
+    def save(self, comment):
+        self.ol.calls.append(('save', self.olid, comment))
+        if self.ol.editions[self.olid].get('save_fails'):
+            return _response(500)
+        self.revision += 1
+        self.ol.editions[self.olid] = dict(self.ol.editions[self.olid], revision=self.revision, ocaid=self.ocaid)
+        return _response(200, {'key': '/books/%s' % self.olid, 'revision': self.revision})
+
+
+def _infile(*olids):
+    return io.StringIO(''.join(json.dumps({'openlibrary': olid, 'identifier': 'ia_%s' % olid}) + '\n'
+                               for olid in olids))
+
+
+def test_update(tmp_path):
+    ol = FakeOpenLibrary({'OL1M': {'title': 'a', 'revision': 1},
+                          'OL2M': {'title': 'b', 'revision': 3, 'ocaid': 'ia_OL2M'},
+                          'OL3M': {'title': 'c', 'revision': 1}},
+                         sync_statuses={'OL3M': [500, 200]})
+    with SyncCache(str(tmp_path / 'sync-cache.tsv')) as sync_cache:
+        updater = update_ocaid.OcaidUpdater(ol, sync_cache)
+        assert [updater.update(olid, 'ia_%s' % olid) for olid in ('OL1M', 'OL2M', 'OL3M')] == ['OL1M', 'OL2M', 'OL3M']
+    assert ol.calls == [('get', 'OL1M'), ('save', 'OL1M', 'add ocaid'), ('sync', 'OL1M'),
+                        ('get', 'OL2M'), ('sync', 'OL2M'),
+                        # a 500 from the sync saves the ocaid again and retries
+                        ('get', 'OL3M'), ('save', 'OL3M', 'add ocaid'), ('sync', 'OL3M'),
+                        ('save', 'OL3M', 'update ocaid'), ('sync', 'OL3M')]
+    assert ol.editions['OL1M']['ocaid'] == 'ia_OL1M'
+
+
+def test_run_journals_done_olids(tmp_path):
+    ol = FakeOpenLibrary({'OL%dM' % i: {'title': 't', 'revision': 1} for i in range(1, 6)})
+    ol.editions['OL4M']['title'] = ''  # fails the title check
+    journal_path = str(tmp_path / 'in.txt.done')
+    with open(journal_path, 'w') as fout:
+        fout.write('OL1M\n')
+    infile = _infile('OL1M', 'OL2M', 'not an OLID', 'OL3M', 'OL4M', 'OL5M')
+    with Journal(journal_path) as journal, SyncCache(str(tmp_path / 'sync-cache.tsv')) as sync_cache:
+        updater = update_ocaid.OcaidUpdater(ol, sync_cache, workers=3)
+        updater.run(infile, journal)
+    assert (updater.done, updater.failed) == (3, 1)
+    assert ('get', 'OL1M') not in ol.calls
+    with open(journal_path) as fin:
+        assert sorted(fin.read().split()) == ['OL1M', 'OL2M', 'OL3M', 'OL5M']
+
+
+def test_run_reads_unchanged_editions_from_the_dump(tmp_path, monkeypatch):
+    editions = {'OL%dM' % i: {'title': 't', 'revision': 2, 'ocaid': 'ia_OL%dM' % i} for i in range(1, 251)}
+    ol = FakeOpenLibrary(editions)
+
+    class FakeDumpIndex(object):
+        def get(self, olid):
+            if olid not in editions:
+                return None
+            _json = dict(editions[olid], key='/books/%s' % olid)
+            # OL7M changed since the dump
+            revision = 1 if olid == 'OL7M' else 2
+            return DumpRow(('/type/edition\t/books/%s\t%d\t2020-01-01\t%s\n' % (
+                olid, revision, json.dumps(dict(_json, revision=revision)))).encode())
+
+    monkeypatch.setattr(update_ocaid, 'edition_from_json',
+                        lambda ol, _json: FakeEdition(ol, _json['key'].split('/')[-1], **_json))
+    with Journal(str(tmp_path / 'in.txt.done')) as journal, \
+            SyncCache(str(tmp_path / 'sync-cache.tsv')) as sync_cache:
+        updater = update_ocaid.OcaidUpdater(ol, sync_cache, dump_index=FakeDumpIndex())
+        updater.run(_infile(*['OL%dM' % i for i in range(1, 301)]), journal)
+    assert [call for call in ol.calls if call[0] == 'query'] == [('query', 100), ('query', 100), ('query', 50)]
+    # only the edition that changed since the dump and those missing from it are fetched
+    fetched = sorted(call[1] for call in ol.calls if call[0] == 'get')
+    assert fetched == sorted(['OL7M'] + ['OL%dM' % i for i in range(251, 301)])
+
+
+def test_second_run_skips_cached_syncs(tmp_path):
+    ol = FakeOpenLibrary({'OL1M': {'title': 'a', 'revision': 3, 'ocaid': 'ia_OL1M'},
+                          'OL2M': {'title': 'b', 'revision': 1},
+                          'OL3M': {'title': 'c', 'revision': 1, 'save_fails': True}})
+    cache_path = str(tmp_path / 'sync-cache.tsv')
+    for run in range(2):
+        with Journal(str(tmp_path / ('run%d.done' % run))) as journal, SyncCache(cache_path) as sync_cache:
+            updater = update_ocaid.OcaidUpdater(ol, sync_cache)
+            ol.calls = []
+            updater.run(_infile('OL1M', 'OL2M', 'OL3M'), journal)
+        assert updater.failed == 1  # the save of OL3M failed
+        assert ('sync', 'OL3M') not in ol.calls
+        with open(cache_path) as fin:
+            assert [line.split()[:2] for line in fin] == [['OL1M', '3'], ['OL2M', '2']]
+    # the second run found OL1M and OL2M synced at their current revisions
+    assert (sync_cache.hits, sync_cache.misses) == (2, 0)
+    assert [call for call in ol.calls if call[0] == 'sync'] == []
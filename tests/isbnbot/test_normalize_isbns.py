@@ -1,5 +1,15 @@
+import gzip
+import json
+import logging
+
+import pytest
+import requests
+from helpers import differential_corpus, dump_row
 from isbnlib import notisbn
-from isbnbot.normalize_isbns import NormalizeISBNJob
+from isbnbot.normalize_isbns import (ISBN_WITH_NON_DIGITS, SAVE_MAX_TRIES, Candidate, NormalizeISBNJob, SaveQueue,
+                                     scan_rows)
+from oldump.batch_isbn import validate_isbn
+from oldump.delta import diff_dumps, write_delta
 
 
 def test_isbn_needs_normalization():  # TODO: Add some isbn's that need normalization
@@ -13,3 +23,211 @@ def test_isbn_needs_normalization():  # TODO: Add some isbn's that need normaliz
 
     for isbn in ("ISBN 13: 9780425016015", "(ebook)0441788386"):
         assert not NormalizeISBNJob.isbn_needs_normalization(isbn)
+
+
+def test_find_candidates(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)  # the job writes its log file relative to the working directory
+    monkeypatch.setattr('sys.argv', ['normalize_isbns.py'])
+    rows = [dump_row('OL%dM' % i, isbn_10=['0-425-01601-3'] if i % 3 else ['0425016013'])
+            for i in range(25)]
+    offsets = [sum(map(len, rows[:i + 1])) for i in range(25)]
+    expected = [Candidate('OL%dM' % i, {'isbn_10': ['0-425-01601-3']}, 1, json.loads(rows[i].split(b'\t')[4]),
+                          i, offsets[i])
+                for i in range(25) if i % 3]
+
+    job = NormalizeISBNJob(ol=object())
+    assert list(job.find_candidates(iter(rows))) == expected
+
+    job = NormalizeISBNJob(ol=object(), workers=2)
+    monkeypatch.setattr('isbnbot.normalize_isbns.SCAN_CHUNK_SIZE', 4)
+    assert list(job.find_candidates(iter(rows))) == expected
+
+
+def test_fetch_editions(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr('sys.argv', ['normalize_isbns.py'])
+
+    class Edition:
+        @staticmethod
+        def get(olid):
+            return 'edition %s' % olid
+
+    ol = type('FakeOpenLibrary', (), {'Edition': Edition})
+    candidates = [Candidate('OL%dM' % i, {'isbn_10': ['0-425-01601-3']}, 1, {'key': '/books/OL%dM' % i}, i, 0)
+                  for i in range(7)]
+    job = NormalizeISBNJob(ol=ol, fetch_window=3, fetch_concurrency=2)
+    fetched = list(job.fetch_editions(iter(candidates)))
+    assert fetched == [(candidate, 'edition %s' % candidate.olid) for candidate in candidates]
+    assert (job.fetched, job.fetch_batches) == (7, 3)
+
+    # editions still at their dump revision are built from the dump JSON
+    monkeypatch.setattr('isbnbot.normalize_isbns.unchanged_keys',
+                        lambda ol, revisions: {key for key in revisions if key.endswith(('1M', '4M'))})
+    monkeypatch.setattr('isbnbot.normalize_isbns.edition_from_json', lambda ol, _json: 'dump %s' % _json['key'])
+    job = NormalizeISBNJob(ol=ol, fetch_window=3, check_revisions=True)
+    editions = [edition for _, edition in job.fetch_editions(iter(candidates))]
+    assert editions == ['edition OL0M', 'dump /books/OL1M', 'edition OL2M', 'edition OL3M', 'dump /books/OL4M',
+                        'edition OL5M', 'edition OL6M']
+    assert (job.fetched, job.reused) == (5, 2)
+
+
+def test_save_limit_and_dry_run(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr('sys.argv', ['normalize_isbns.py'])
+    job = NormalizeISBNJob(ol=object(), dry_run=True, limit=3)
+
+    def save_fn():
+        raise AssertionError('dry_run must not save')
+
+    assert [job.save(save_fn) for _ in range(3)] == [True, True, False]
+    assert job.changed == 3
+
+
+def test_save_queue_retries_server_errors(monkeypatch):
+    monkeypatch.setattr('backoff._sync.time.sleep', lambda seconds: None)
+    responses = {'OL1M': [500, 503, 200], 'OL2M': [200], 'OL3M': [502] * SAVE_MAX_TRIES}
+    calls = []
+
+    def make_save(olid):
+        def save_fn():
+            response = requests.models.Response()
+            response.status_code = responses[olid].pop(0)
+            calls.append(olid)
+            return response
+        return save_fn
+
+    with SaveQueue(2, 2, logging.getLogger('test')) as queue:
+        for olid in responses:
+            queue.submit(make_save(olid))
+    assert (queue.saved, queue.failed) == (2, 1)
+    assert sorted(calls) == ['OL1M'] * 3 + ['OL2M'] + ['OL3M'] * SAVE_MAX_TRIES
+
+
+@pytest.mark.parametrize('compressed', [True, False])
+def test_run_resumes_from_checkpoint(tmp_path, monkeypatch, compressed):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr('sys.argv', ['normalize_isbns.py'])
+    dump_path = str(tmp_path / ('dump.txt.gz' if compressed else 'dump.txt'))
+    with (gzip.open if compressed else open)(dump_path, 'wb') as fout:
+        for i in range(10):
+            fout.write(dump_row('OL%dM' % i, isbn_10=['0-425-01601-3'] if i % 2 else ['0425016013']))
+
+    class Edition:
+        def __init__(self, olid):
+            self.olid = olid
+            self.type = {'key': '/type/edition'}
+            self.isbn_10 = ['0-425-01601-3']
+
+        @classmethod
+        def get(cls, olid):
+            return cls(olid)
+
+        def save(self, comment):
+            raise AssertionError('dry_run must not save')
+
+    ol = type('FakeOpenLibrary', (), {'Edition': Edition, 'base_url': 'http://localhost',
+                                      'session': requests.Session()})
+    checkpoint_path = str(tmp_path / 'checkpoint.json')
+    job = NormalizeISBNJob(ol=ol, limit=2, checkpoint_path=checkpoint_path)
+    job.run(dump_path)
+    assert job.changed == 2
+
+    job = NormalizeISBNJob(ol=ol, limit=0, checkpoint_path=checkpoint_path, resume=True)
+    edited = []
+    monkeypatch.setattr(job, 'save', lambda save_fn, olid, position: edited.append(olid) or True)
+    job.run(dump_path)
+    assert edited == ['OL5M', 'OL7M', 'OL9M']
+
+
+def test_scan_rows_prefilter():
+    rows = [dump_row('OL1M', isbn_10=['0425016013'], isbn_13=['978-0-425-01601-5']),
+            dump_row('OL2M', isbn_10=['0425016013', '0441788386']),
+            dump_row('OL3M', title='No ISBN'),
+            b'/type/work\t/works/OL1W\t1\t2020-01-01\t{"isbn_10": ["0-425-01601-3"]}\n',
+            dump_row('OL4M', isbn_13=['9780425016015', ' 9780425016015'])]
+    candidates, prefiltered = scan_rows(rows)
+    assert [candidate.olid for candidate in candidates] == ['OL1M', 'OL4M']
+    assert prefiltered == 3
+
+
+def test_prefilter_keeps_every_isbn_that_needs_normalization():
+    for isbn in differential_corpus(count=5000, seed=2):
+        if validate_isbn(isbn)[3]:
+            assert ISBN_WITH_NON_DIGITS.search(json.dumps({'isbn_13': ['0425016013', isbn]}).encode()), isbn
+
+
+def test_checkpoint_warns_without_seek_points(tmp_path, monkeypatch, caplog):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr('sys.argv', ['normalize_isbns.py'])
+    monkeypatch.setattr('isbnbot.normalize_isbns.has_seek_points', lambda: False)
+    NormalizeISBNJob(ol=object())
+    assert 'indexed_gzip' not in caplog.text
+    NormalizeISBNJob(ol=object(), checkpoint_path=str(tmp_path / 'checkpoint.json'))
+    assert 'indexed_gzip is not installed' in caplog.text
+
+
+def test_run_on_delta(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr('sys.argv', ['normalize_isbns.py'])
+    old_path, new_path, delta_path = (str(tmp_path / name) for name in ('old.txt', 'new.txt', 'delta.txt'))
+    with open(old_path, 'wb') as fout:
+        for i in range(1, 6):
+            fout.write(dump_row('OL%dM' % i, isbn_10=['0425016013']))
+    with open(new_path, 'wb') as fout:
+        for i in range(1, 6):
+            if i % 2:
+                fout.write(dump_row('OL%dM' % i, isbn_10=['0425016013']))
+            else:  # OL2M and OL4M gained a hyphenated ISBN since the old dump
+                fout.write(dump_row('OL%dM' % i, isbn_10=['0-425-01601-3']).replace(b'\t1\t', b'\t2\t', 1))
+    write_delta(diff_dumps(old_path, new_path), delta_path)
+
+    job = NormalizeISBNJob(ol=object(), limit=0)
+    seen = []
+    monkeypatch.setattr(job, 'fetch_editions', lambda candidates: iter(seen.extend(c.olid for c in candidates) or []))
+    monkeypatch.setattr(job, 'ol', type('FakeOpenLibrary', (), {'base_url': 'http://localhost',
+                                                                'session': requests.Session()}))
+    job.run(delta_path)
+    assert seen == ['OL2M', 'OL4M']
+
+
+def test_resume_retries_failed_saves(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr('sys.argv', ['normalize_isbns.py'])
+    monkeypatch.setattr('backoff._sync.time.sleep', lambda seconds: None)
+    dump_path = str(tmp_path / 'dump.txt')
+    with open(dump_path, 'wb') as fout:
+        for i in range(6):
+            fout.write(dump_row('OL%dM' % i, isbn_10=['0-425-01601-3']))
+    failing = {'OL3M'}
+    saved = []
+
+    class Edition:
+        def __init__(self, olid):
+            self.olid = olid
+            self.type = {'key': '/type/edition'}
+            self.isbn_10 = ['0-425-01601-3']
+
+        @classmethod
+        def get(cls, olid):
+            return cls(olid)
+
+        def save(self, comment):
+            response = requests.models.Response()
+            response.status_code = 500 if self.olid in failing else 200
+            if response.status_code == 200:
+                saved.append(self.olid)
+            return response
+
+    ol = type('FakeOpenLibrary', (), {'Edition': Edition, 'base_url': 'http://localhost',
+                                      'session': requests.Session()})
+    checkpoint_path = str(tmp_path / 'checkpoint.json')
+    job = NormalizeISBNJob(ol=ol, dry_run=False, limit=0, checkpoint_path=checkpoint_path)
+    job.run(dump_path)
+    assert saved == ['OL0M', 'OL1M', 'OL2M', 'OL4M', 'OL5M']
+    assert job.save_queue.failed == 1
+
+    failing.clear()
+    del saved[:]
+    job = NormalizeISBNJob(ol=ol, dry_run=False, limit=0, checkpoint_path=checkpoint_path, resume=True)
+    job.run(dump_path)
+    assert saved == ['OL3M', 'OL4M', 'OL5M']
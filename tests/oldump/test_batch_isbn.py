@@ -0,0 +1,26 @@
+from helpers import differential_corpus
+from isbnbot.normalize_isbns import NormalizeISBNJob
+from oldump.batch_isbn import validate_isbn, validate_isbns
+
+
+def test_validate_isbns_matches_isbnlib():
+    corpus = differential_corpus()
+    result = validate_isbns(corpus)
+    for i, isbn in enumerate(corpus):
+        batch = (result.canonical[i], bool(result.valid[i]), result.isbn13[i], bool(result.needs_normalization[i]))
+        assert batch == validate_isbn(isbn), isbn
+
+
+def test_validate_isbn_matches_isbn_needs_normalization():
+    for isbn in differential_corpus(count=5000, seed=1):
+        if isbn == '----------0425016013':  # isbnlib raises IndexError
+            continue
+        assert validate_isbn(isbn)[3] == bool(NormalizeISBNJob.isbn_needs_normalization(isbn)), isbn
+
+
+def test_validate_isbns():
+    result = validate_isbns(['0-425-01601-3', '9780425016015', '080442957x', 'Bob'])
+    assert result.canonical == ['0425016013', '9780425016015', '080442957X', '']
+    assert result.valid.tolist() == [True, True, True, False]
+    assert result.isbn13 == ['9780425016015', '9780425016015', '9780804429573', '']
+    assert result.needs_normalization.tolist() == [True, False, True, False]
@@ -0,0 +1,56 @@
+import pytest
+
+from helpers import dump_row
+from oldump.cache import EditionCache, build_cache
+
+
+def test_cache(tmp_path):
+    dump_path, db_path = str(tmp_path / 'dump.txt'), str(tmp_path / 'editions.sqlite')
+    with open(dump_path, 'wb') as fout:
+        fout.write(dump_row('/books/OL1M', 3, ocaid='roman00', isbn_10=['0-425-01601-3'], isbn_13=['9780425016015'],
+                            works=[{'key': '/works/OL1W'}], source_records=['ia:roman00']))
+        fout.write(dump_row('/books/OL2M', ocaid='greek00', covers=[123], works=[{'key': '/works/OL1W'}]))
+        fout.write(dump_row('/books/OL3M', ocaid='', isbn_10=['0425016013']))
+        fout.write(dump_row('/works/OL1W', _type='/type/work'))
+        fout.write(dump_row('/books/OL4M', 2, ocaid='latin00', covers=[]))
+
+    assert build_cache(dump_path, db_path, batch_size=2) == 4
+    with EditionCache(db_path) as cache:
+        assert len(cache) == 4
+        # OL4M has an empty covers field, which coverbot's dump scan does not count as coverless either
+        assert list(cache.coverless_with_ocaid()) == [('/books/OL1M', 3, 'roman00')]
+        assert cache.editions_by_ocaid('greek00') == ['/books/OL2M']
+        assert sorted(cache.editions_by_isbn('0425016013')) == ['/books/OL3M']
+        assert cache.editions_by_isbn('9780425016015') == ['/books/OL1M']
+        assert sorted(cache.editions_by_work('/works/OL1W')) == ['/books/OL1M', '/books/OL2M']
+        assert cache.editions_by_source_record('ia:roman00') == ['/books/OL1M']
+        assert list(cache.isbns_with_non_digits()) == [('/books/OL1M', 3, 10, '0-425-01601-3')]
+
+    # rebuilding replaces the cache
+    with open(dump_path, 'wb') as fout:
+        fout.write(dump_row('/books/OL9M'))
+    assert build_cache(dump_path, db_path) == 1
+    with EditionCache(db_path) as cache:
+        assert len(cache) == 1
+
+    with pytest.raises(FileNotFoundError):
+        EditionCache(str(tmp_path / 'missing.sqlite'))
+
+
+@pytest.mark.parametrize('batch_size', [1, 10])
+def test_cache_replaces_repeated_keys(tmp_path, batch_size):
+    dump_path, db_path = str(tmp_path / 'dump.txt'), str(tmp_path / 'editions.sqlite')
+    with open(dump_path, 'wb') as fout:
+        fout.write(dump_row('/books/OL1M', 1, isbn_10=['0425016013'], works=[{'key': '/works/OL1W'}],
+                            source_records=['ia:roman00']))
+        fout.write(dump_row('/books/OL2M', isbn_10=['0425016013']))
+        fout.write(dump_row('/books/OL1M', 2, isbn_13=['9780425016015'], works=[{'key': '/works/OL2W'}]))
+
+    assert build_cache(dump_path, db_path, batch_size=batch_size) == 2
+    with EditionCache(db_path) as cache:
+        assert len(cache) == 2
+        assert cache.editions_by_isbn('0425016013') == ['/books/OL2M']
+        assert cache.editions_by_isbn('9780425016015') == ['/books/OL1M']
+        assert cache.editions_by_work('/works/OL1W') == []
+        assert cache.editions_by_work('/works/OL2W') == ['/books/OL1M']
+        assert cache.editions_by_source_record('ia:roman00') == []
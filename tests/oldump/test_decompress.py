@@ -0,0 +1,72 @@
+import gzip
+import os
+import shutil
+
+import pytest
+
+from oldump import decompress
+from oldump.decompress import inflate_blocks, open_gzip_stream
+
+LINES = [('/type/edition\t/books/OL%dM\t1\t2020-01-01\t{"title": "%s"}\n' % (i, 'x' * (i % 300))).encode()
+         for i in range(20000)]
+
+
+@pytest.fixture
+def dump_path(tmp_path):
+    path = str(tmp_path / 'dump.txt.gz')
+    with open(path, 'wb') as fout:  # three members and trailing padding, like concatenated dumps
+        for start in range(0, len(LINES), 8000):
+            fout.write(gzip.compress(b''.join(LINES[start:start + 8000])))
+        fout.write(b'\x00' * 8)
+    return path
+
+
+@pytest.mark.parametrize('backend', ['auto', 'thread', 'process', 'gzip',
+                                     pytest.param('pigz', marks=pytest.mark.skipif(not shutil.which('pigz'),
+                                                                                   reason='pigz is not installed'))])
+def test_backends_read_the_same_lines(dump_path, backend, monkeypatch):
+    monkeypatch.setattr(decompress, 'BLOCK_SIZE', 4096)
+    with open_gzip_stream(dump_path, backend) as fin:
+        assert list(fin) == LINES
+
+
+def test_close_before_the_end(dump_path):
+    for backend in ('thread', 'process'):
+        fin = open_gzip_stream(dump_path, backend)
+        assert fin.readline() == LINES[0]
+        fin.close()
+        assert not fin.raw.worker.is_alive()
+
+
+def test_truncated_gzip(tmp_path):
+    path = str(tmp_path / 'truncated.txt.gz')
+    with open(path, 'wb') as fout:
+        fout.write(gzip.compress(b''.join(LINES))[:-100])
+    with open(path, 'rb') as fin, pytest.raises(EOFError):
+        list(inflate_blocks(fin))
+    with open_gzip_stream(path, 'thread') as fin, pytest.raises(EOFError):
+        fin.read()
+
+
+def test_fallback_to_gzip(dump_path, monkeypatch):
+    monkeypatch.setattr('shutil.which', lambda name: None)
+    with open_gzip_stream(dump_path, 'pigz') as fin:
+        assert isinstance(fin, gzip.GzipFile)
+        assert fin.readline() == LINES[0]
+    with pytest.raises(ValueError):
+        open_gzip_stream(dump_path, 'lzma')
+
+
+def test_subprocess_backend(dump_path, tmp_path, monkeypatch):
+    # gzip -dc takes the same arguments, so it stands in for pigz where pigz is not installed
+    if not shutil.which('gzip'):
+        pytest.skip('gzip is not installed')
+    bin_path = tmp_path / 'bin'
+    bin_path.mkdir()
+    (bin_path / 'pigz').write_text('#!/bin/sh\nexec gzip "$@"\n')
+    (bin_path / 'pigz').chmod(0o755)
+    monkeypatch.setenv('PATH', '%s:%s' % (bin_path, os.environ['PATH']))
+    with open_gzip_stream(dump_path, 'pigz') as fin:
+        assert list(fin) == LINES
+    with open_gzip_stream(str(tmp_path / 'missing.txt.gz'), 'pigz') as fin, pytest.raises(OSError):
+        fin.read()
@@ -0,0 +1,45 @@
+import gzip
+
+import pytest
+
+from oldump.delta import ADDED, CHANGED, REMOVED, diff_dumps, write_delta
+from oldump.reader import read_dump
+
+
+def _write_dump(path, revisions):
+    with gzip.open(path, 'wt') as fout:
+        for key in sorted(revisions):
+            fout.write('/type/edition\t%s\t%d\t2020-01-01\t{"key": "%s"}\n' % (key, revisions[key], key))
+
+
+def test_diff_dumps(tmp_path):
+    old_path, new_path = str(tmp_path / 'old.txt.gz'), str(tmp_path / 'new.txt.gz')
+    _write_dump(old_path, {'/books/OL1M': 1, '/books/OL2M': 3, '/books/OL3M': 1, '/books/OL5M': 2})
+    _write_dump(new_path, {'/books/OL0M': 1, '/books/OL2M': 4, '/books/OL3M': 1, '/books/OL5M': 2,
+                           '/books/OL6M': 1})
+
+    changes = [(change.kind, (change.new or change.old).key) for change in diff_dumps(old_path, new_path)]
+    assert changes == [(ADDED, '/books/OL0M'), (REMOVED, '/books/OL1M'), (CHANGED, '/books/OL2M'),
+                       (ADDED, '/books/OL6M')]
+
+    delta_path, removed_path = str(tmp_path / 'delta.txt.gz'), str(tmp_path / 'removed.txt')
+    counts = write_delta(diff_dumps(old_path, new_path), delta_path, removed_path)
+    assert counts == {ADDED: 2, CHANGED: 1, REMOVED: 1}
+    assert [(row.key, row.revision) for row in read_dump(delta_path)] == [('/books/OL0M', 1), ('/books/OL2M', 4),
+                                                                          ('/books/OL6M', 1)]
+    with open(removed_path) as fin:
+        assert fin.read() == '/books/OL1M\n'
+
+    assert [change.kind for change in diff_dumps(old_path, old_path)] == []
+    empty_path = str(tmp_path / 'empty.txt.gz')
+    _write_dump(empty_path, {})
+    assert {change.kind for change in diff_dumps(new_path, empty_path)} == {REMOVED}
+    assert len(list(diff_dumps(empty_path, new_path))) == 5
+
+
+def test_unsorted_dump(tmp_path):
+    path = str(tmp_path / 'unsorted.txt')
+    with open(path, 'w') as fout:
+        fout.write('/type/edition\t/books/OL2M\t1\t2020-01-01\t{}\n/type/edition\t/books/OL1M\t1\t2020-01-01\t{}\n')
+    with pytest.raises(ValueError):
+        list(diff_dumps(path, path))
@@ -0,0 +1,76 @@
+import gzip
+import os
+
+import pytest
+
+from helpers import dump_row
+from oldump.index import GZIP_INDEX_SUFFIX, INDEX_SUFFIX, DumpIndex, build_index
+from oldump.olid import pack_olid, unpack_olid
+
+
+def _rows():
+    for i in range(2000, 0, -1):  # dumps are not sorted by key
+        for _type, key in (('/type/edition', '/books/OL%dM' % i), ('/type/work', '/works/OL%dW' % i)):
+            yield dump_row(key, i % 7 + 1, _type, n=i)
+    yield dump_row('/languages/eng', _type='/type/language')
+
+
+def test_pack_olid():
+    assert unpack_olid(pack_olid('OL123M')) == 'OL123M'
+    assert pack_olid('/works/OL123W') == pack_olid('OL123W') != pack_olid('OL123M')
+    assert len({pack_olid(olid) for olid in ('OL1M', 'OL1W', 'OL1A', 'OL2M')}) == 4
+    for olid in ('OL123', 'eng', 'OLxM', ''):
+        with pytest.raises(ValueError):
+            pack_olid(olid)
+
+
+@pytest.mark.parametrize('compressed', [False, True])
+def test_index_lookup(tmp_path, compressed):
+    rows = list(_rows())
+    dump_path = str(tmp_path / ('dump.txt.gz' if compressed else 'dump.txt'))
+    with (gzip.open if compressed else open)(dump_path, 'wb') as fout:
+        fout.writelines(rows)
+
+    assert build_index(dump_path) == 4000
+    with DumpIndex(dump_path) as index:
+        assert len(index) == 4000
+        for row in (rows[0], rows[1], rows[1234], rows[-2]):
+            olid = row.split(b'\t')[1].split(b'/')[-1].decode()
+            assert index.get_line(olid) == row
+        row = index.get('OL77W')
+        assert (row.key, row.revision, row.json['n']) == ('/works/OL77W', 77 % 7 + 1, 77)
+        assert index.locate('OL2001M') is None
+        assert 'eng' not in index
+        assert index.get('OL2001M') is None
+
+    assert build_index(dump_path, type_prefix='/type/work') == 2000
+    with DumpIndex(dump_path) as index:
+        assert 'OL5W' in index and 'OL5M' not in index
+
+
+def test_stale_index(tmp_path):
+    dump_path = str(tmp_path / 'dump.txt')
+    with open(dump_path, 'wb') as fout:
+        fout.writelines(_rows())
+    build_index(dump_path)
+    with open(dump_path, 'ab') as fout:
+        fout.write(dump_row('OL9999M'))
+    with pytest.raises(ValueError):
+        DumpIndex(dump_path)
+
+
+def test_gzip_index_needs_seek_points(tmp_path, monkeypatch):
+    dump_path = str(tmp_path / 'dump.txt.gz')
+    with gzip.open(dump_path, 'wb') as fout:
+        fout.writelines(_rows())
+    build_index(dump_path)
+
+    os.remove(dump_path + INDEX_SUFFIX + GZIP_INDEX_SUFFIX)
+    with pytest.raises(ValueError):
+        DumpIndex(dump_path)
+
+    monkeypatch.setattr('oldump.index.has_seek_points', lambda: False)
+    with pytest.raises(ImportError):
+        build_index(dump_path)
+    with pytest.raises(ImportError):
+        DumpIndex(dump_path)
@@ -0,0 +1,37 @@
+import numpy as np
+import pytest
+
+from oldump.isbn_index import ISBNIndex, build_isbn_index
+
+
+@pytest.fixture
+def index_path(tmp_path):
+    tsv_path, index_path = str(tmp_path / 'isbns.tsv'), str(tmp_path / 'isbns.idx')
+    with open(tsv_path, 'w') as fout:
+        fout.write('9780441788385\tOL11M\tOL3W\n')
+        fout.write("BAD-ISBN:\t'0000000002'\tOL25422504M\tOL16800386W\n")
+        fout.write('9780425016015\tOL7M\tNONE\n')
+        fout.write('9780441788385\tOL10M\tOL4W\n')  # a shared ISBN matches its lowest OLID, not its first line
+        for i in range(1000):
+            fout.write('979%010d\tOL%dM\tOL%dW\n' % (i * 7919, 100 + i, 100 + i))
+    assert build_isbn_index(tsv_path, index_path) == 1003
+    return index_path
+
+
+def test_lookup(index_path):
+    with ISBNIndex(index_path) as index:
+        assert len(index) == 1003
+        matches = index.lookup(['0441788386', '978-0-425-01601-5', '9780000000002', 'not an isbn', 9780425016015])
+        assert matches.found.tolist() == [True, True, False, False, True]
+        assert matches.edition.tolist() == [10, 7, 0, 0, 7]
+        assert matches.work.tolist() == [4, 0, 0, 0, 0]
+
+        assert index.get('9780425016015') == ('OL7M', None)
+        assert index.get('9780441788385') == ('OL10M', 'OL4W')
+        assert index.get('9780000000002') is None
+        assert index.editions('0441788386') == ['OL10M', 'OL11M']
+        assert '9780441788385' in index and '9780000000002' not in index
+
+        keys = np.array([979 * 10 ** 10 + i * 7919 for i in range(1000)], dtype=np.uint64)
+        assert index.lookup(keys.tolist()).found.all()
+        assert index.lookup([]).found.tolist() == []
@@ -0,0 +1,44 @@
+import numpy as np
+
+from oldump.isbn_index import ISBNIndex, build_isbn_index
+from oldump.isbn_records import (RECORD, SORTED_FLAG, RecordWriter, read_records, records_to_tsv, sort_records,
+                                 tsv_to_records)
+
+TSV = ['9780441788385\tOL10M\tOL3W\n',
+       "BAD-ISBN:\t'0000000002'\tOL25422504M\tOL16800386W\n",
+       '9780425016015\tOL7M\tNONE\n',
+       '9780441788385\tOL10M\tOL3W\n']
+
+
+def test_tsv_round_trip(tmp_path):
+    tsv_path, records_path, bad_path = (str(tmp_path / name) for name in ('isbns.tsv', 'isbns.bin', 'bad.tsv'))
+    with open(tsv_path, 'w') as fout:
+        fout.writelines(TSV)
+
+    assert tsv_to_records(tsv_path, records_path, bad_path) == 3
+    records, flags = read_records(records_path)
+    assert isinstance(records, np.memmap) and flags == 0
+    assert records.tolist() == [(9780441788385, 10, 3), (9780425016015, 7, 0), (9780441788385, 10, 3)]
+    with open(bad_path) as fin:
+        assert fin.readlines() == [TSV[1]]
+
+    assert sort_records(records_path) == 2
+    records, flags = read_records(records_path)
+    assert records['isbn13'].tolist() == [9780425016015, 9780441788385] and flags == SORTED_FLAG
+
+    assert records_to_tsv(records_path, tsv_path) == 2
+    with open(tsv_path) as fin:
+        assert fin.readlines() == [TSV[2], TSV[0]]
+
+    # the ISBN index builds from either form
+    build_isbn_index(records_path, str(tmp_path / 'isbns.idx'))
+    with ISBNIndex(str(tmp_path / 'isbns.idx')) as index:
+        assert index.get('0441788386') == ('OL10M', 'OL3W')
+
+
+def test_empty_records(tmp_path):
+    path = str(tmp_path / 'empty.bin')
+    with RecordWriter(path) as writer:
+        writer.write(np.empty(0, dtype=RECORD))
+    assert len(read_records(path)[0]) == 0
+    assert sort_records(path) == 0
@@ -0,0 +1,21 @@
+from oldump.journal import Journal
+
+
+def test_journal(tmp_path, monkeypatch):
+    path = str(tmp_path / 'fixed.txt')
+    fsyncs = []
+    monkeypatch.setattr('os.fsync', fsyncs.append)
+    with Journal(path, sync_every=3) as journal:
+        for i in range(7):
+            journal.add('OL%dM' % i)
+        assert 'OL6M' in journal and 'OL7M' not in journal
+        assert len(fsyncs) == 2
+    assert len(fsyncs) == 3
+
+    with open(path, 'a') as fout:
+        fout.write('OL7')  # torn by a crash
+    with Journal(path) as journal:
+        assert len(journal) == 7 and 'OL7M' not in journal
+        journal.add('OL8M')
+    with open(path) as fin:
+        assert fin.read().split() == ['OL%dM' % i for i in range(7)] + ['OL8M']
@@ -0,0 +1,30 @@
+import threading
+import time
+
+from oldump.ratelimit import RateLimiter
+
+
+def test_rate_limiter_is_shared_between_threads():
+    limiter = RateLimiter(rate=200)
+    times = []
+
+    def worker():
+        for _ in range(5):
+            limiter.wait()
+            times.append(time.monotonic())
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    times.sort()
+    assert times[-1] - times[0] >= 19 / 200 * 0.9
+
+
+def test_no_limit():
+    start = time.monotonic()
+    limiter = RateLimiter()
+    for _ in range(1000):
+        limiter.wait()
+    assert time.monotonic() - start < 0.5
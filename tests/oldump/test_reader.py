@@ -0,0 +1,47 @@
+import gzip
+import json
+
+import pytest
+
+from helpers import dump_row
+from oldump.reader import DumpRow, json_loads, orjson, read_dump
+
+
+ROWS = [dump_row('/books/OL1M', 3, title='Roman Art'),
+        dump_row('/works/OL1W', _type='/type/work'),
+        dump_row('/books/OL2M', ocaid='romanart00')]
+
+
+def test_dump_row():
+    row = DumpRow(ROWS[0])
+    assert (row.type, row.key, row.olid, row.revision) == ('/type/edition', '/books/OL1M', 'OL1M', 3)
+    assert row.last_modified == '2020-01-01T00:00:00'
+    assert row._json is None  # not decoded until used
+    assert row.json['title'] == 'Roman Art'
+
+
+@pytest.mark.parametrize('compression', ['plain', 'gzip', 'multi-member gzip'])
+def test_read_dump(tmp_path, compression):
+    path = str(tmp_path / 'dump.txt')
+    if compression == 'plain':
+        with open(path, 'wb') as fout:
+            fout.writelines(ROWS)
+    else:
+        members = [ROWS] if compression == 'gzip' else [[row] for row in ROWS]
+        with open(path, 'wb') as fout:
+            for member in members:
+                fout.write(gzip.compress(b''.join(member)))
+
+    assert [row.key for row in read_dump(path)] == ['/books/OL1M', '/works/OL1W', '/books/OL2M']
+    assert [row.json['key'] for row in read_dump(path, type_prefix='/type/edition')] == ['/books/OL1M', '/books/OL2M']
+    with open(path, 'rb') as fin:
+        assert len(list(read_dump(fin if compression == 'plain' else gzip.open(fin)))) == 3
+
+
+def test_json_loads():
+    assert json_loads('json') is json.loads
+    assert json_loads() is (json.loads if orjson is None else orjson.loads)
+    with pytest.raises(ValueError):
+        json_loads('yaml')
+    row = DumpRow(ROWS[2], json_loads('json'))
+    assert row.json['ocaid'] == 'romanart00'
@@ -0,0 +1,35 @@
+from olclient.openlibrary import OpenLibrary
+
+from oldump.revisions import edition_from_json, unchanged_keys
+
+
+class FakeResponse:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self.docs
+
+
+def test_unchanged_keys(monkeypatch):
+    ol = OpenLibrary()
+    live = [{'key': '/books/OL1M', 'revision': 3}, {'key': '/books/OL2M', 'revision': 5}]
+    monkeypatch.setattr(ol.session, 'get', lambda url, params: FakeResponse(live))
+    assert unchanged_keys(ol, {'/books/OL1M': 3, '/books/OL2M': '4', '/books/OL3M': 1}) == {'/books/OL1M'}
+
+    def fail(url, params):
+        raise IOError('offline')
+    monkeypatch.setattr(ol.session, 'get', fail)
+    assert unchanged_keys(ol, {'/books/OL1M': 3}) == set()
+
+
+def test_edition_from_json():
+    ol = OpenLibrary()
+    data = {'key': '/books/OL1M', 'type': {'key': '/type/edition'}, 'title': 'Roman Art', 'revision': 3,
+            'authors': [{'key': '/authors/OL1A'}], 'works': [{'key': '/works/OL1W'}], 'isbn_10': ['0199223955']}
+    edition = edition_from_json(ol, data)
+    assert edition.olid == 'OL1M'
+    assert edition.json() == data
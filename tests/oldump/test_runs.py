@@ -0,0 +1,60 @@
+import io
+import random
+
+import pytest
+
+import oldump.runs
+from oldump.runs import merge_runs
+
+
+def test_merge_runs():
+    rng = random.Random(0)
+    runs = [sorted({'%05d\n' % rng.randrange(3000) for _ in range(rng.randrange(30))}) for _ in range(300)]
+    expected = sorted({line for run in runs for line in run})
+    fout = io.StringIO()
+    merge_runs(iter(runs), fout)
+    assert fout.getvalue() == ''.join(expected)
+
+
+def test_merge_runs_bounds_open_files(monkeypatch):
+    # more runs than the fan-in, over several generations and with runs left over in each
+    runs = [sorted({'%04d\n' % i, '%04d\n' % (i // 2), 'z\n'}) for i in range(1000)]
+    expected = sorted({line for run in runs for line in run})
+    opened = []
+    most_open = []
+    real_open = open
+
+    class TrackedFile(object):
+        def __init__(self, *args):
+            self.file = real_open(*args)
+            opened.append(self)
+            most_open.append(len(opened))
+
+        def __getattr__(self, name):
+            return getattr(self.file, name)
+
+        def __iter__(self):
+            return iter(self.file)
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            self.close()
+
+        def close(self):
+            if self in opened:
+                opened.remove(self)
+            self.file.close()
+
+    monkeypatch.setattr(oldump.runs, 'open', TrackedFile, raising=False)
+    fout = io.StringIO()
+    merge_runs(iter(runs), fout, fan_in=8)
+    assert fout.getvalue() == ''.join(expected)
+    assert max(most_open) <= 8 + 1  # the inputs of a merge and the run it writes
+    assert not opened
+
+
+def test_merge_runs_fan_in():
+    with pytest.raises(ValueError):
+        merge_runs([], io.StringIO(), fan_in=1)
@@ -0,0 +1,53 @@
+import gzip
+
+import pytest
+
+from oldump.reader import read_dump
+from oldump.scan import chunk_offsets, iter_rows, scan_chunks, scan_dump
+
+
+def keys(chunk):
+    return [row.key for row in iter_rows(chunk, type_prefix='/type/edition')]
+
+
+@pytest.fixture
+def dump_path(tmp_path):
+    path = str(tmp_path / 'dump.txt')
+    with open(path, 'w') as fout:
+        for i in range(500):
+            _type = '/type/work' if i % 5 == 0 else '/type/edition'
+            fout.write('%s\t/books/OL%dM\t1\t2020-01-01\t{"title": "%s"}\n' % (_type, i, 'x' * (i % 37)))
+        fout.write('/type/edition\t/books/OL500M\t1\t2020-01-01\t{}')  # no trailing newline
+    return path
+
+
+def test_chunk_offsets():
+    data = b'a\nbb\n\nccc\ndddd'
+    offsets = list(chunk_offsets(data, 3))
+    assert [data[start:end] for start, end in offsets] == [b'a\nbb\n', b'\nccc\n', b'dddd']
+    assert list(chunk_offsets(data, 100)) == [(0, len(data))]
+
+
+@pytest.mark.parametrize('workers', [1, 3])
+def test_scan_chunks(dump_path, workers):
+    expected = [row.key for row in read_dump(dump_path, type_prefix='/type/edition')]
+    chunks = list(scan_chunks(dump_path, keys, workers=workers, chunk_size=1000))
+    assert len(chunks) > 3 * workers
+    assert [key for chunk in chunks for key in chunk] == expected
+
+
+def test_scan_empty_dump(tmp_path):
+    path = tmp_path / 'empty.txt'
+    path.write_bytes(b'')
+    assert list(scan_chunks(str(path), keys, workers=2)) == []
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_scan_gzip_dump(dump_path, workers):
+    gzip_path = dump_path + '.gz'
+    with open(dump_path, 'rb') as fin, gzip.open(gzip_path, 'wb') as fout:
+        fout.write(fin.read())
+    expected = [row.key for row in read_dump(dump_path, type_prefix='/type/edition')]
+    for path in (dump_path, gzip_path):
+        chunks = list(scan_dump(path, keys, workers=workers, chunk_size=1000))
+        assert [key for chunk in chunks for key in chunk] == expected
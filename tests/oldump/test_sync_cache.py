@@ -0,0 +1,24 @@
+from oldump.sync_cache import FAILED, NO_CHANGES, SYNCED, SyncCache
+
+
+def test_sync_cache(tmp_path):
+    path = str(tmp_path / 'sync-cache.tsv')
+    with SyncCache(path, sync_every=2) as cache:
+        cache.record('OL1M', 3, SYNCED)
+        cache.record('OL2M', 1, NO_CHANGES)
+        cache.record('OL3M', 7, FAILED)
+        cache.record('OL4M', None, SYNCED)  # revision unknown: nothing to key it by
+
+    with open(path, 'a') as fout:
+        fout.write('OL5M\t1')  # torn by a crash
+    with SyncCache(path) as cache:
+        assert len(cache) == 3
+        assert cache.is_done('OL1M', 3) and cache.is_done('OL2M', 1)
+        assert not cache.is_done('OL1M', 4)  # edited since
+        assert not cache.is_done('OL3M', 7)
+        assert not cache.is_done('OL4M', 1) and not cache.is_done('OL5M', 1)
+        assert not cache.is_done('OL1M', None)
+        assert (cache.hits, cache.misses) == (2, 5)
+        cache.record('OL1M', 4, SYNCED)
+    with SyncCache(path) as cache:
+        assert cache.is_done('OL1M', 4) and not cache.is_done('OL1M', 3)
@@ -0,0 +1,70 @@
+import importlib.util
+import io
+import os
+import sys
+import types
+
+# onixparser imports onixcheck for its online validation test only, and CI does not install onix-bot's requirements
+sys.modules.setdefault('onixcheck', types.ModuleType('onixcheck'))
+ONIXPARSER_PATH = os.path.join(os.path.dirname(__file__), '..', '..', 'onix-bot', 'onixparser.py')
+spec = importlib.util.spec_from_file_location('onixparser', ONIXPARSER_PATH)
+onixparser = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(onixparser)
+
+PRODUCT = """<Product>
+<RecordReference>%(n)d</RecordReference>
+<ProductIdentifier><ProductIDType>02</ProductIDType><IDValue>%(isbn10)s</IDValue></ProductIdentifier>
+<ProductIdentifier><ProductIDType>15</ProductIDType><IDValue>%(isbn13)s</IDValue></ProductIdentifier>
+<Title><TitleType>01</TitleType><TitleText>Title %(n)d</TitleText></Title>
+<Author><ContributorRole>A01</ContributorRole><PersonName>Author %(n)d</PersonName></Author>
+<Language><LanguageRole>01</LanguageRole><LanguageCode>%(language)s</LanguageCode></Language>
+<Publisher><PublishingRole>01</PublishingRole><PublisherName>Publisher %(n)d</PublisherName></Publisher>
+<CityOfPublication>City %(n)d</CityOfPublication>
+<CountryOfPublication>%(country)s</CountryOfPublication>
+<MediaFile><MediaFileTypeCode>04</MediaFileTypeCode><MediaFileLinkTypeCode>01</MediaFileLinkTypeCode>
+<MediaFileLink>http://example.com/%(n)d.jpg</MediaFileLink></MediaFile>
+</Product>
+"""
+PRODUCTS = [{'n': 0, 'isbn10': '0199223955', 'isbn13': '9780199223954', 'language': 'eng', 'country': 'GB'},
+            {'n': 1, 'isbn10': '0425016013', 'isbn13': '9780425016015', 'language': 'fre', 'country': 'FR'},
+            {'n': 2, 'isbn10': '0441788386', 'isbn13': '9780441788385', 'language': 'ger', 'country': 'DE'}]
+
+
+def onix_feed():
+    return io.BytesIO(('<?xml version="1.0"?>\n<ONIXMessage>\n<Header><FromCompany>Example</FromCompany></Header>\n'
+                       + ''.join(PRODUCT % product for product in PRODUCTS) + '</ONIXMessage>\n').encode())
+
+
+def test_products_read_their_own_fields():
+    products = onixparser.OnixFeedParser(onix_feed()).products
+    assert len(products) == 3
+    for product, expected in zip(products, PRODUCTS):
+        n = expected['n']
+        assert product.title == 'Title %d' % n
+        assert product.identifiers == {'isbn10': expected['isbn10'], 'isbn13': expected['isbn13']}
+        assert product.publisher == 'Publisher %d' % n
+        assert product.authors == ['Author %d' % n]
+        assert product.languages == expected['language']
+        assert product.media_file_link == 'http://example.com/%d.jpg' % n
+        assert product.publication_country == expected['country']
+        assert product.publication_city == 'City %d' % n
+
+
+def test_stream_matches_list():
+    listed = [product.get_json for product in onixparser.OnixFeedParser(onix_feed()).products]
+    streamed = [product.get_json for product in onixparser.OnixFeedParser(onix_feed(), stream=True).products]
+    assert streamed == listed
+    assert len(streamed) == 3
+
+
+def test_stream_clears_products_once_the_next_is_read():
+    products = onixparser.OnixFeedParser(onix_feed(), stream=True).products
+    first = next(products)
+    assert first.title == 'Title 0'
+    second = next(products)
+    assert second.title == 'Title 1'
+    assert len(first.product) == 0 and first.title == ''
+    next(products)
+    assert first.product.getparent() is None  # dropped from the tree as a preceding sibling
+    assert len(second.product) == 0
+    assert list(products) == []